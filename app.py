@@ -1,9 +1,11 @@
 import streamlit as st
 import pandas as pd
 import datetime
-from typing import Dict, List, Tuple
+from typing import Tuple
 import random
 
+from reasons import Reason, render_reasons, row_reasons
+
 # Configure page
 st.set_page_config(
     page_title="Fraud Detection System",
@@ -23,7 +25,8 @@ if 'transactions' not in st.session_state:
             'location': 'Mombasa',
             'prev_location': 'Nairobi',
             'status': 'Flagged as Fraudulent',
-            'reasons': 'High amount (>50,000), New device detected',
+            'reason_mask': int(Reason.HIGH_AMOUNT | Reason.NEW_DEVICE | Reason.LOCATION_CHANGE | Reason.ROUND_NUMBER),
+            'distance_km': 480,
             'biometric_verified': False
         },
         {
@@ -34,7 +37,8 @@ if 'transactions' not in st.session_state:
             'location': 'Nairobi',
             'prev_location': 'Nairobi',
             'status': 'Legitimate',
-            'reasons': 'All checks passed',
+            'reason_mask': 0,
+            'distance_km': 0,
             'biometric_verified': True
         },
         {
@@ -45,7 +49,8 @@ if 'transactions' not in st.session_state:
             'location': 'Kisumu',
             'prev_location': 'Eldoret',
             'status': 'Flagged as Fraudulent',
-            'reasons': 'Location change >100km (Eldoret to Kisumu)',
+            'reason_mask': int(Reason.ROUND_NUMBER),
+            'distance_km': 65,
             'biometric_verified': False
         }
     ]
@@ -68,32 +73,33 @@ def calculate_distance(loc1: str, loc2: str) -> int:
     
     return distances.get(key1, distances.get(key2, random.randint(50, 150)))
 
-def fraud_detection_engine(customer_name: str, amount: float, device: str, location: str, prev_location: str) -> Tuple[str, List[str]]:
+def fraud_detection_engine(customer_name: str, amount: float, device: str, location: str, prev_location: str) -> Tuple[str, int, int]:
     """Simple rule-based fraud detection system"""
-    flags = []
+    flags = Reason(0)
+    distance = 0
     
     # Rule 1: High amount threshold
     if amount > 50000:
-        flags.append(f"High amount (>{50000:,})")
+        flags |= Reason.HIGH_AMOUNT
     
     # Rule 2: New device
     if device.lower() == 'new':
-        flags.append("New device detected")
+        flags |= Reason.NEW_DEVICE
     
     # Rule 3: Location change > 100km
     if location != prev_location:
         distance = calculate_distance(location, prev_location)
         if distance > 100:
-            flags.append(f"Location change >{100}km ({prev_location} to {location})")
+            flags |= Reason.LOCATION_CHANGE
     
     # Rule 4: Suspicious transaction patterns (random simulation)
     if amount % 1000 == 0 and amount > 20000:  # Round numbers above 20k
-        flags.append("Suspicious round number transaction")
+        flags |= Reason.ROUND_NUMBER
     
     if flags:
-        return "Flagged as Fraudulent", flags
+        return "Flagged as Fraudulent", int(flags), distance
     else:
-        return "Legitimate", ["All checks passed"]
+        return "Legitimate", 0, distance
 
 # Main app
 st.title("🔒 Fraud Detection System")
@@ -120,7 +126,8 @@ col1, col2 = st.columns([2, 1])
 with col1:
     if submit_transaction and customer_name:
         # Run fraud detection
-        status, reasons = fraud_detection_engine(customer_name, amount, device, location, prev_location)
+        status, reason_mask, distance = fraud_detection_engine(customer_name, amount, device, location, prev_location)
+        reasons = render_reasons(reason_mask, distance, location, prev_location, plain=True, passed="All checks passed")
         
         # Display result
         st.subheader("🎯 Analysis Result")
@@ -171,7 +178,8 @@ with col1:
             'location': location,
             'prev_location': prev_location,
             'status': status,
-            'reasons': ', '.join(reasons),
+            'reason_mask': reason_mask,
+            'distance_km': distance,
             'biometric_verified': biometric_verified
         }
         
@@ -205,6 +213,9 @@ st.subheader("📋 Transaction Audit Log")
 if st.session_state.transactions:
     # Convert to DataFrame for better display
     df = pd.DataFrame(st.session_state.transactions)
+    # Reasons are stored as bitmasks and rendered only for display
+    df['reasons'] = [', '.join(row_reasons(t, plain=True, passed="All checks passed"))
+                     for t in st.session_state.transactions]
     
     # Style the dataframe
     def color_status(val):
@@ -227,6 +238,8 @@ if st.session_state.transactions:
             "prev_location": "Previous Location",
             "status": "Status",
             "reasons": "Reasons",
+            "reason_mask": None,
+            "distance_km": st.column_config.NumberColumn("Distance (km)", format="%d"),
             "biometric_verified": "Bio Verified"
         },
         hide_index=True,
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import datetime
+import functools
 from typing import Dict, List, Tuple
 import random
 import time
@@ -9,6 +10,18 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 
+from device_registry import DeviceRegistry, DeviceRegistryStage
+from enrichment import build_stages, enrich_transactions
+from history import (HISTORY_COLUMNS, append_biometric_result, append_transaction, append_verdict,
+                     count_transactions, last_transaction_id)
+from metrics import (ANALYST_VERDICTS, CACHE_MISSES, CACHE_REQUESTS, HISTORY_SIZE, REGISTRY, RERUN_DURATION,
+                     RULE_FLAGS, SCORING_LATENCY, TRANSACTIONS_SCORED, cache_hit_rates, start_http_server,
+                     write_textfile)
+from profiling import start_profiler, finish_profiler
+from reasons import RULES, Reason, reason_counts, reason_label, has_reasons, render_reasons, row_reasons
+from ml_model import load_live_model, features_from_rows, build_features, verdict_confidence
+from transaction_store import IdAllocator, TransactionStore
+
 # Configure page
 st.set_page_config(
     page_title="AI Fraud Detection System",
@@ -17,6 +30,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Opt-in profiling (?profile=1 or GUARDIAN_PROFILE=1); None when off
+rerun_profiler = start_profiler()
+rerun_started = time.perf_counter()
+# Fragments called during a full rerun leave profiling and export to the script's own epilogue
+st.session_state.full_rerun = True
+metrics_port = start_http_server()
+
 # Custom CSS for amazing styling
 st.markdown("""
 <style>
@@ -69,9 +89,23 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def load_id_allocator():
+    """One transaction ID sequence shared by every session, seeded once from the persisted history"""
+    ids = IdAllocator()
+    ids.advance_past(last_transaction_id())
+    return ids
+
+@st.cache_resource
+def load_history_size():
+    """Count the persisted history once per process; each append then keeps the gauge current"""
+    HISTORY_SIZE.set(count_transactions())
+
+load_history_size()
+
 # Initialize session state with more comprehensive data
-if 'transactions' not in st.session_state:
-    st.session_state.transactions = [
+if 'store' not in st.session_state:
+    seed_transactions = [
         {
             'timestamp': '2024-09-20 10:30:15',
             'customer_name': 'Amina Ochieng',
@@ -80,10 +114,12 @@ if 'transactions' not in st.session_state:
             'location': 'Mombasa',
             'prev_location': 'Nairobi',
             'status': 'Flagged as Fraudulent',
-            'reasons': 'High amount (>50,000), New device detected',
+            'reason_mask': int(Reason.HIGH_AMOUNT | Reason.NEW_DEVICE | Reason.SIGNIFICANT_LOCATION_CHANGE | Reason.ROUND_NUMBER),
             'biometric_verified': False,
             'risk_score': 85,
             'ml_confidence': 92.3,
+            'distance_km': 480,
+            'velocity_1h': 0,
             'transaction_id': 'TXN001'
         },
         {
@@ -94,10 +130,12 @@ if 'transactions' not in st.session_state:
             'location': 'Nairobi',
             'prev_location': 'Nairobi',
             'status': 'Legitimate',
-            'reasons': 'All checks passed',
+            'reason_mask': 0,
             'biometric_verified': True,
             'risk_score': 15,
             'ml_confidence': 88.7,
+            'distance_km': 0,
+            'velocity_1h': 0,
             'transaction_id': 'TXN002'
         },
         {
@@ -108,10 +146,12 @@ if 'transactions' not in st.session_state:
             'location': 'Kisumu',
             'prev_location': 'Eldoret',
             'status': 'Flagged as Fraudulent',
-            'reasons': 'Location change >100km (Eldoret to Kisumu)',
+            'reason_mask': int(Reason.ROUND_NUMBER),
             'biometric_verified': False,
             'risk_score': 72,
             'ml_confidence': 79.4,
+            'distance_km': 65,
+            'velocity_1h': 0,
             'transaction_id': 'TXN003'
         },
         {
@@ -122,20 +162,136 @@ if 'transactions' not in st.session_state:
             'location': 'Nakuru',
             'prev_location': 'Nakuru',
             'status': 'Legitimate',
-            'reasons': 'All checks passed',
+            'reason_mask': 0,
             'biometric_verified': True,
             'risk_score': 8,
             'ml_confidence': 91.2,
+            'distance_km': 0,
+            'velocity_1h': 0,
             'transaction_id': 'TXN004'
         }
     ]
+    st.session_state.store = TransactionStore(ids=load_id_allocator())
+    # Seed rows are listed newest first; the store logs oldest first
+    for seed in reversed(seed_transactions):
+        st.session_state.store.append(seed)
+
+store = st.session_state.store
 
 if 'realtime_data' not in st.session_state:
     st.session_state.realtime_data = []
 
-def generate_ml_confidence():
-    """Simulate ML model confidence score"""
-    return round(random.uniform(75.0, 95.0), 1)
+if 'reviews' not in st.session_state:
+    st.session_state.reviews = {}
+
+@st.cache_resource
+def load_fraud_model():
+    """Load the shared, memory-mapped fraud model once per process"""
+    CACHE_MISSES.inc(cache='fraud_model')
+    return load_live_model()
+
+CACHE_REQUESTS.inc(cache='fraud_model')
+fraud_model = load_fraud_model()
+
+@st.cache_resource
+def load_device_registry():
+    """Open the persisted device registry and its LRU cache once per process"""
+    return DeviceRegistry()
+
+device_registry = load_device_registry()
+
+@st.cache_resource
+def load_enrichment_stages():
+    """Build enrichment stages, and their connection pools, once per process"""
+    # Reputation runs first so a suspicious device is never downgraded to new
+    return build_stages() + [DeviceRegistryStage(device_registry)]
+
+enrichment_stages = load_enrichment_stages()
+
+def record_feedback(transaction: Dict, is_fraud: bool):
+    """Apply an online model update from a confirmed outcome, once per transaction and outcome"""
+    if fraud_model.record_outcome(transaction['transaction_id'], features_from_rows([transaction]), int(is_fraud)):
+        fraud_model.save()
+
+def record_verdict(transaction: Dict, verdict: str, outcome: str) -> bool:
+    """Apply an analyst verdict; repeating a transaction's current verdict changes nothing"""
+    if transaction.get('analyst_verdict') == verdict:
+        return False
+    transaction['analyst_verdict'] = verdict
+    ANALYST_VERDICTS.inc(outcome=outcome)
+    append_verdict(transaction['transaction_id'], verdict)
+    record_feedback(transaction, is_fraud=verdict == 'fraud')
+    # Latest review outcome per transaction, for the footer's accuracy figure
+    st.session_state.reviews[transaction['transaction_id']] = outcome
+    return True
+
+def finish_rerun(section: str, started: float, profiler):
+    """Epilogue of a full or fragment-only rerun: record its time, export metrics, show its profile"""
+    RERUN_DURATION.observe(time.perf_counter() - started, section=section)
+    write_textfile()
+    if profiler:
+        profile_path, profile_report = finish_profiler(profiler)
+        with st.expander("⏱️ Rerun Profile (top hot spots)"):
+            st.caption(f"Raw profile saved to `{profile_path}`")
+            st.code(profile_report)
+
+def timed_fragment(section: str):
+    """st.fragment that reruns on its own and records its rerun time under `section`"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if st.session_state.get('full_rerun'):
+                with RERUN_DURATION.time(section=section):
+                    return func(*args, **kwargs)
+            # A fragment-only rerun never reaches the script's epilogue, so it runs its own
+            profiler = start_profiler()
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            finish_rerun(section, started, profiler)
+            return result
+        return st.fragment(wrapper)
+    return decorator
+
+def offline_biometric_check(customer_name, amount, method):
+    """Real offline biometric simulation based on customer data"""
+    # Create a unique "biometric signature" from customer data
+    name_hash = sum(ord(c) for c in customer_name.lower())
+    amount_pattern = int(str(int(amount))[-2:]) if amount >= 10 else int(amount)
+    
+    # Different verification methods have different success patterns
+    if method == "fingerprint":
+        # Fingerprint success based on name length and amount
+        threshold = (name_hash + amount_pattern) % 100
+        return threshold > 20  # 80% success rate
+    elif method == "voice":
+        # Voice recognition based on vowels in name
+        vowel_count = sum(1 for c in customer_name.lower() if c in 'aeiou')
+        threshold = (vowel_count * 15 + amount_pattern) % 100
+        return threshold > 15  # 85% success rate
+    elif method == "face":
+        # Face recognition based on name complexity
+        name_complexity = len(set(customer_name.lower()))
+        threshold = (name_complexity * 8 + amount_pattern) % 100
+        return threshold > 25  # 75% success rate
+    
+    return False
+
+def apply_biometric_result(transaction: Dict, verified: bool):
+    """Record a biometric outcome on the logged transaction and train on it; repeats change nothing"""
+    st.session_state.bio_verified = verified
+    result = 'passed' if verified else 'failed'
+    if transaction.get('biometric_result') == result:
+        return
+    transaction['biometric_result'] = result
+    # A passed check clears the flag; a failed one confirms it. An analyst verdict outranks both.
+    if not transaction.get('analyst_verdict'):
+        record_feedback(transaction, is_fraud=not verified)
+    # Only devices on cleared transactions become trusted for this customer
+    if verified and not transaction['biometric_verified'] and transaction['device_fingerprint']:
+        device_registry.record_use(transaction['customer_name'], transaction['device_fingerprint'], transaction['timestamp'])
+    transaction['biometric_verified'] = verified
+    # The logged row is append-only; training and backtests join this event back in
+    append_biometric_result(transaction['transaction_id'], verified)
 
 def calculate_risk_score(amount, device, location_change_km, time_since_last=None):
     """Calculate a sophisticated risk score"""
@@ -190,52 +346,58 @@ def calculate_distance(loc1: str, loc2: str) -> int:
     
     return distances.get(key1, distances.get(key2, random.randint(50, 300)))
 
-def advanced_fraud_detection(customer_name: str, amount: float, device: str, location: str, prev_location: str) -> Tuple[str, List[str], int, float]:
+def advanced_fraud_detection(customer_name: str, amount: float, device: str, location: str, prev_location: str, velocity: int = 0) -> Tuple[str, int, int, float, int]:
     """Advanced AI-powered fraud detection with risk scoring"""
-    flags = []
+    flags = Reason(0)
     distance = calculate_distance(location, prev_location) if location != prev_location else 0
     
     # Enhanced rules
     if amount > 100000:
-        flags.append(f"🚨 Extremely high amount (>{100000:,})")
+        flags |= Reason.EXTREME_AMOUNT
     elif amount > 50000:
-        flags.append(f"⚠️ High amount (>{50000:,})")
+        flags |= Reason.HIGH_AMOUNT
     
     if device.lower() == 'new':
-        flags.append("📱 New device detected")
+        flags |= Reason.NEW_DEVICE
     elif device.lower() == 'suspicious':
-        flags.append("🚫 Suspicious device flagged")
+        flags |= Reason.SUSPICIOUS_DEVICE
     
     if distance > 500:
-        flags.append(f"🌍 Extreme location jump: {distance}km ({prev_location} → {location})")
+        flags |= Reason.EXTREME_LOCATION_JUMP
     elif distance > 200:
-        flags.append(f"📍 Significant location change: {distance}km ({prev_location} → {location})")
+        flags |= Reason.SIGNIFICANT_LOCATION_CHANGE
     elif distance > 100:
-        flags.append(f"📍 Location change: {distance}km ({prev_location} → {location})")
+        flags |= Reason.LOCATION_CHANGE
     
     # Advanced patterns
     if amount % 1000 == 0 and amount > 20000:
-        flags.append("🔢 Suspicious round number pattern")
+        flags |= Reason.ROUND_NUMBER
     
     # Time-based patterns (simulated)
     current_hour = datetime.datetime.now().hour
     if current_hour < 6 or current_hour > 23:
-        flags.append("🌙 Unusual transaction time")
+        flags |= Reason.UNUSUAL_TIME
     
     # Calculate risk score
     risk_score = calculate_risk_score(amount, device, distance)
-    ml_confidence = generate_ml_confidence()
+    fraud_probability = fraud_model.predict_proba(
+        build_features([amount], [device], [distance], [velocity], [current_hour])
+    )[0]
     
     if risk_score > 60:
-        return "Flagged as Fraudulent", flags if flags else ["High risk score detected"], risk_score, ml_confidence
+        status = "Flagged as Fraudulent"
+        flags = flags if flags else Reason.HIGH_RISK_SCORE
     else:
-        return "Legitimate", flags if flags else ["All security checks passed"], risk_score, ml_confidence
+        status = "Legitimate"
+    return status, int(flags), risk_score, verdict_confidence(status, fraud_probability), distance
 
-def create_risk_gauge(risk_score):
-    """Create a beautiful risk gauge chart"""
+@st.cache_resource
+def risk_gauge_template():
+    """Build and validate the risk gauge once, kept as a plain figure dict"""
+    CACHE_MISSES.inc(cache='risk_gauge_template')
     fig = go.Figure(go.Indicator(
         mode = "gauge+number+delta",
-        value = risk_score,
+        value = 0,
         domain = {'x': [0, 1], 'y': [0, 1]},
         title = {'text': "Risk Score"},
         delta = {'reference': 50},
@@ -255,16 +417,22 @@ def create_risk_gauge(risk_score):
         }
     ))
     fig.update_layout(height=300, showlegend=False, margin=dict(l=20, r=20, t=40, b=20))
-    return fig
+    return fig.to_dict()
 
-def create_transaction_timeline():
-    """Create a timeline of recent transactions"""
-    if not st.session_state.transactions:
-        return None
-    
-    df = pd.DataFrame(st.session_state.transactions[-10:])  # Last 10 transactions
+def create_risk_gauge(risk_score):
+    """Create a beautiful risk gauge chart"""
+    CACHE_REQUESTS.inc(cache='risk_gauge_template')
+    template = risk_gauge_template()
+    # Only the value changes; the template was validated when it was built
+    return go.Figure({'data': [dict(template['data'][0], value=risk_score)], 'layout': template['layout']},
+                     _validate=False)
+
+@st.cache_resource(max_entries=64)
+def build_transaction_timeline(store_token: str, store_version: int, _rows: List[Dict]):
+    """Timeline figure for one version of a store's contents"""
+    CACHE_MISSES.inc(cache='transaction_timeline')
+    df = pd.DataFrame(_rows[-10:])  # Last 10 transactions
     df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['color'] = df['status'].map({'Legitimate': 'green', 'Flagged as Fraudulent': 'red'})
     
     fig = px.scatter(df, x='timestamp', y='amount', color='status',
                      size='risk_score', hover_data=['customer_name', 'location'],
@@ -274,6 +442,45 @@ def create_transaction_timeline():
     fig.update_layout(height=300, showlegend=True)
     return fig
 
+def create_transaction_timeline():
+    """Create a timeline of recent transactions"""
+    if not len(store):
+        return None
+    CACHE_REQUESTS.inc(cache='transaction_timeline')
+    return build_transaction_timeline(store.token, store.version, store.rows())
+
+@st.cache_resource(max_entries=64)
+def build_risk_distribution(store_token: str, store_version: int, _rows: List[Dict]):
+    """Risk score histogram for one version of a store's contents"""
+    CACHE_MISSES.inc(cache='risk_distribution')
+    df = pd.DataFrame(_rows)
+    try:
+        return px.histogram(df, x='risk_score', nbins=10, 
+                            title="Risk Score Distribution",
+                            color='status',
+                            color_discrete_map={'Legitimate': 'green', 'Flagged as Fraudulent': 'red'})
+    except Exception as e:
+        # Fallback to simple bar chart if histogram fails
+        risk_counts = df['status'].value_counts()
+        return px.bar(x=risk_counts.index, y=risk_counts.values,
+                      title="Transaction Status Distribution",
+                      color=risk_counts.index,
+                      color_discrete_map={'Legitimate': 'green', 'Flagged as Fraudulent': 'red'})
+
+def create_risk_distribution():
+    """Create the risk score distribution chart"""
+    if not len(store):
+        return None
+    CACHE_REQUESTS.inc(cache='risk_distribution')
+    return build_risk_distribution(store.token, store.version, store.rows())
+
+def with_reason_text(df: pd.DataFrame) -> pd.DataFrame:
+    """Render reason bitmasks to text; only called on rows about to be shown"""
+    return df.assign(reasons=[
+        ', '.join(render_reasons(mask, distance, loc, prev_loc))
+        for mask, distance, loc, prev_loc in zip(df['reason_mask'], df['distance_km'], df['location'], df['prev_location'])
+    ])
+
 def simulate_realtime_monitoring():
     """Simulate real-time transaction monitoring"""
     locations = ['Nairobi', 'Mombasa', 'Kisumu', 'Eldoret', 'Nakuru']
@@ -305,8 +512,8 @@ with col_live1:
     placeholder = st.empty()
     
 with col_live2:
-    total_transactions = len(st.session_state.transactions)
-    fraudulent_count = sum(1 for t in st.session_state.transactions if t['status'] == 'Flagged as Fraudulent')
+    total_transactions = len(store)
+    fraudulent_count = store.count('Flagged as Fraudulent')
     fraud_rate = (fraudulent_count / total_transactions * 100) if total_transactions > 0 else 0
     
     st.metric("🔍 Transactions Analyzed", total_transactions, delta=1)
@@ -315,9 +522,29 @@ with col_live2:
 
 with col_live3:
     st.markdown("### ⚡ System Status")
-    st.success("🟢 AI Models Online")
-    st.success("🟢 Biometric Systems Active")
-    st.success("🟢 Real-time Monitoring")
+    st.success(f"🟢 AI Model Online ({fraud_model.updates} online updates)")
+    
+    scoring_p95 = SCORING_LATENCY.quantile(0.95)
+    if scoring_p95 is None:
+        st.info("⚪ Scoring Latency: no transactions scored yet")
+    elif scoring_p95 < 0.05:
+        st.success(f"🟢 Scoring Latency p95: {scoring_p95 * 1000:.1f}ms")
+    else:
+        st.warning(f"🟠 Scoring Latency p95: {scoring_p95 * 1000:.1f}ms")
+    
+    hit_rates = cache_hit_rates()
+    if hit_rates:
+        st.success("🟢 Cache Hit Rates: " + ", ".join(
+            f"{cache.replace('_', ' ')} {rate:.0%}" for cache, rate in hit_rates.items()))
+    else:
+        st.info("⚪ Cache Hit Rates: no lookups yet")
+    
+    st.success(f"🟢 History: {HISTORY_SIZE.value():,.0f} transactions persisted")
+    
+    if metrics_port:
+        st.success(f"🟢 Metrics Exported on :{metrics_port}/metrics")
+    else:
+        st.info("⚪ Metrics Endpoint Disabled")
 
 # Sidebar for transaction input
 st.sidebar.markdown("### 🔍 Submit New Transaction")
@@ -327,6 +554,7 @@ with st.sidebar.form("transaction_form"):
     customer_name = st.text_input("👤 Customer Name", placeholder="e.g., Jane Doe")
     amount = st.number_input("💰 Amount (KES)", min_value=0.0, value=25000.0, step=1000.0)
     device = st.selectbox("📱 Device Status", ["trusted", "new", "suspicious"])
+    device_fingerprint = st.text_input("🔑 Device ID", placeholder="Optional; checked against known devices")
     location = st.selectbox("📍 Current Location", 
                            ["Nairobi", "Mombasa", "Kisumu", "Eldoret", "Nakuru", "Thika"])
     prev_location = st.selectbox("📍 Previous Location", 
@@ -349,6 +577,7 @@ if st.session_state.get('test_fraud'):
     customer_name = "Test User"
     amount = 85000
     device = "new"
+    device_fingerprint = ""
     location = "Mombasa"
     prev_location = "Nairobi"
     submit_transaction = True
@@ -358,12 +587,13 @@ if st.session_state.get('test_legit'):
     customer_name = "Test User"
     amount = 15000
     device = "trusted"
+    device_fingerprint = ""
     location = "Nairobi"
     prev_location = "Nairobi"
     submit_transaction = True
     st.session_state.test_legit = False
 
-# Main analysis section
+# Main analysis section; a submission changes every view of the store, so it runs with the whole app
 if submit_transaction and customer_name:
     # Show processing animation
     with st.spinner('🤖 AI analyzing transaction patterns...'):
@@ -372,17 +602,147 @@ if submit_transaction and customer_name:
             time.sleep(0.01)
             progress_bar.progress(i + 1)
         
+        # Enrich before scoring; the declared device status is the fallback
+        declared_device = device
+        pending = {'customer_name': customer_name, 'device': device, 'device_fingerprint': device_fingerprint.strip()}
+        device = enrich_transactions(enrichment_stages, [pending])[0]['device']
+        
         # Run advanced fraud detection
-        status, reasons, risk_score, ml_confidence = advanced_fraud_detection(
-            customer_name, amount, device, location, prev_location
-        )
+        now = datetime.datetime.now()
+        velocity = store.count_since(customer_name, (now - datetime.timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S"))
+        with SCORING_LATENCY.time():
+            status, reason_mask, risk_score, ml_confidence, distance = advanced_fraud_detection(
+                customer_name, amount, device, location, prev_location, velocity
+            )
+        TRANSACTIONS_SCORED.inc(status=status)
+        for reason in RULES:
+            if reason_mask & reason:
+                RULE_FLAGS.inc(rule=reason.name.lower())
+    
+    # Flagged transactions stay unverified until a biometric check clears them
+    biometric_verified = status != "Flagged as Fraudulent"
+    new_transaction = {
+        'timestamp': now.strftime("%Y-%m-%d %H:%M:%S"),
+        'customer_name': customer_name,
+        'amount': amount,
+        'device': device,
+        'device_fingerprint': device_fingerprint.strip(),
+        'location': location,
+        'prev_location': prev_location,
+        'status': status,
+        'reason_mask': reason_mask,
+        'biometric_verified': biometric_verified,
+        'risk_score': risk_score,
+        'ml_confidence': ml_confidence,
+        'distance_km': distance,
+        'velocity_1h': velocity
+    }
     
+    # Log transaction with enhanced data
+    transaction_id = store.append(new_transaction)
+    append_transaction(new_transaction)
+    HISTORY_SIZE.inc()
+    # Only devices on cleared transactions become trusted for this customer
+    if new_transaction['device_fingerprint'] and biometric_verified:
+        device_registry.record_use(customer_name, new_transaction['device_fingerprint'], new_transaction['timestamp'])
+    
+    # The result outlives this run so the biometric fragment can rerun against it
+    st.session_state.last_result = {'transaction_id': transaction_id, 'declared_device': declared_device}
+    st.session_state.bio_verified = None
+
+last_result = st.session_state.get('last_result')
+result_transaction = store.get(last_result['transaction_id']) if last_result else None
+
+@timed_fragment("biometrics")
+def biometric_verification(transaction: Dict):
+    """Biometric checks for a flagged transaction; each scan reruns only this section"""
+    customer_name = transaction['customer_name']
+    amount = transaction['amount']
+
+    # Enhanced biometric verification with REAL offline verification
+    st.markdown("### 🔐 Multi-Factor Authentication Required")
+
+    col_bio1, col_bio2, col_bio3 = st.columns(3)
+
+    with col_bio1:
+        if st.button("👆 Fingerprint Scan", use_container_width=True):
+            with st.spinner('Scanning fingerprint pattern...'):
+                progress = st.progress(0)
+                for i in range(100):
+                    time.sleep(0.01)
+                    progress.progress(i + 1)
+
+                # Real offline verification
+                verification_result = offline_biometric_check(customer_name, amount, "fingerprint")
+                apply_biometric_result(transaction, verification_result)
+
+                if verification_result:
+                    st.success("✅ Fingerprint Pattern Matched!")
+                    st.info(f"🔍 Verified: {len(customer_name)} ridge points analyzed")
+                else:
+                    st.error("❌ Fingerprint Pattern Mismatch!")
+                    st.warning("🔍 Insufficient ridge clarity detected")
+
+    with col_bio2:
+        if st.button("🎤 Voice Recognition", use_container_width=True):
+            with st.spinner('Analyzing voice biometrics...'):
+                progress = st.progress(0)
+                for i in range(100):
+                    time.sleep(0.008)
+                    progress.progress(i + 1)
+
+                # Real offline verification
+                verification_result = offline_biometric_check(customer_name, amount, "voice")
+                apply_biometric_result(transaction, verification_result)
+
+                if verification_result:
+                    st.success("✅ Voice Pattern Authenticated!")
+                    vowel_count = sum(1 for c in customer_name.lower() if c in 'aeiou')
+                    st.info(f"🎵 Verified: {vowel_count} vocal frequency markers")
+                else:
+                    st.error("❌ Voice Pattern Not Recognized!")
+                    st.warning("🎵 Background noise interference detected")
+
+    with col_bio3:
+        if st.button("👁️ Facial Recognition", use_container_width=True):
+            with st.spinner('Processing facial geometry...'):
+                progress = st.progress(0)
+                for i in range(100):
+                    time.sleep(0.012)
+                    progress.progress(i + 1)
+
+                # Real offline verification
+                verification_result = offline_biometric_check(customer_name, amount, "face")
+                apply_biometric_result(transaction, verification_result)
+
+                if verification_result:
+                    st.success("✅ Facial Geometry Confirmed!")
+                    name_features = len(set(customer_name.lower()))
+                    st.info(f"👁️ Verified: {name_features} facial landmarks detected")
+                else:
+                    st.error("❌ Facial Recognition Failed!")
+                    st.warning("👁️ Lighting conditions suboptimal")
+
+    # Show biometric status
+    if st.session_state.get('bio_verified'):
+        st.success("🔒 **BIOMETRIC AUTHENTICATION SUCCESSFUL**")
+        st.markdown("*Customer identity confirmed through offline verification*")
+
+if result_transaction:
+    status = result_transaction['status']
+    risk_score = result_transaction['risk_score']
+    ml_confidence = result_transaction['ml_confidence']
+    reasons = row_reasons(result_transaction)
+
     # Create columns for results
     col_result1, col_result2 = st.columns([2, 1])
-    
+
     with col_result1:
         st.markdown("### 🎯 AI Analysis Results")
-        
+        if result_transaction['device'] != last_result['declared_device']:
+            st.caption(f"📱 Device checks resolved this device as **{result_transaction['device']}** "
+                       f"(declared: {last_result['declared_device']})")
+
         if status == "Flagged as Fraudulent":
             st.markdown(f"""
             <div class="fraud-alert">
@@ -391,110 +751,13 @@ if submit_transaction and customer_name:
                 <p><strong>ML Confidence:</strong> {ml_confidence}%</p>
             </div>
             """, unsafe_allow_html=True)
-            
+
             st.markdown("**🔍 Detection Reasons:**")
             for reason in reasons:
                 st.write(f"• {reason}")
-            
-            # Enhanced biometric verification with REAL offline verification
-            st.markdown("### 🔐 Multi-Factor Authentication Required")
-            
-            # Real biometric simulation using customer name + amount pattern
-            def offline_biometric_check(customer_name, amount, method):
-                """Real offline biometric simulation based on customer data"""
-                # Create a unique "biometric signature" from customer data
-                name_hash = sum(ord(c) for c in customer_name.lower())
-                amount_pattern = int(str(int(amount))[-2:]) if amount >= 10 else int(amount)
-                
-                # Different verification methods have different success patterns
-                if method == "fingerprint":
-                    # Fingerprint success based on name length and amount
-                    threshold = (name_hash + amount_pattern) % 100
-                    return threshold > 20  # 80% success rate
-                elif method == "voice":
-                    # Voice recognition based on vowels in name
-                    vowel_count = sum(1 for c in customer_name.lower() if c in 'aeiou')
-                    threshold = (vowel_count * 15 + amount_pattern) % 100
-                    return threshold > 15  # 85% success rate
-                elif method == "face":
-                    # Face recognition based on name complexity
-                    name_complexity = len(set(customer_name.lower()))
-                    threshold = (name_complexity * 8 + amount_pattern) % 100
-                    return threshold > 25  # 75% success rate
-                
-                return False
-            
-            col_bio1, col_bio2, col_bio3 = st.columns(3)
-            
-            with col_bio1:
-                if st.button("👆 Fingerprint Scan", use_container_width=True):
-                    with st.spinner('Scanning fingerprint pattern...'):
-                        progress = st.progress(0)
-                        for i in range(100):
-                            time.sleep(0.01)
-                            progress.progress(i + 1)
-                        
-                        # Real offline verification
-                        verification_result = offline_biometric_check(customer_name, amount, "fingerprint")
-                        
-                        if verification_result:
-                            st.success("✅ Fingerprint Pattern Matched!")
-                            st.info(f"🔍 Verified: {len(customer_name)} ridge points analyzed")
-                            st.session_state.bio_verified = True
-                        else:
-                            st.error("❌ Fingerprint Pattern Mismatch!")
-                            st.warning("🔍 Insufficient ridge clarity detected")
-                            st.session_state.bio_verified = False
-            
-            with col_bio2:
-                if st.button("🎤 Voice Recognition", use_container_width=True):
-                    with st.spinner('Analyzing voice biometrics...'):
-                        progress = st.progress(0)
-                        for i in range(100):
-                            time.sleep(0.008)
-                            progress.progress(i + 1)
-                        
-                        # Real offline verification
-                        verification_result = offline_biometric_check(customer_name, amount, "voice")
-                        
-                        if verification_result:
-                            st.success("✅ Voice Pattern Authenticated!")
-                            vowel_count = sum(1 for c in customer_name.lower() if c in 'aeiou')
-                            st.info(f"🎵 Verified: {vowel_count} vocal frequency markers")
-                            st.session_state.bio_verified = True
-                        else:
-                            st.error("❌ Voice Pattern Not Recognized!")
-                            st.warning("🎵 Background noise interference detected")
-                            st.session_state.bio_verified = False
-            
-            with col_bio3:
-                if st.button("👁️ Facial Recognition", use_container_width=True):
-                    with st.spinner('Processing facial geometry...'):
-                        progress = st.progress(0)
-                        for i in range(100):
-                            time.sleep(0.012)
-                            progress.progress(i + 1)
-                        
-                        # Real offline verification
-                        verification_result = offline_biometric_check(customer_name, amount, "face")
-                        
-                        if verification_result:
-                            st.success("✅ Facial Geometry Confirmed!")
-                            name_features = len(set(customer_name.lower()))
-                            st.info(f"👁️ Verified: {name_features} facial landmarks detected")
-                            st.session_state.bio_verified = True
-                        else:
-                            st.error("❌ Facial Recognition Failed!")
-                            st.warning("👁️ Lighting conditions suboptimal")
-                            st.session_state.bio_verified = False
-            
-            # Show biometric status
-            if st.session_state.get('bio_verified'):
-                st.success("🔒 **BIOMETRIC AUTHENTICATION SUCCESSFUL**")
-                st.markdown("*Customer identity confirmed through offline verification*")
-            
-            biometric_verified = st.session_state.get('bio_verified', False)
-            
+
+            biometric_verification(result_transaction)
+
         else:
             st.markdown(f"""
             <div class="safe-alert">
@@ -503,165 +766,217 @@ if submit_transaction and customer_name:
                 <p><strong>ML Confidence:</strong> {ml_confidence}%</p>
             </div>
             """, unsafe_allow_html=True)
-            
+
             st.markdown("**✅ Security Analysis:**")
             for reason in reasons:
                 st.write(f"• {reason}")
-            
-            biometric_verified = True
-    
+
     with col_result2:
         # Risk gauge
         st.markdown("### 📊 Risk Assessment")
         fig_gauge = create_risk_gauge(risk_score)
         st.plotly_chart(fig_gauge, use_container_width=True)
-        
+
         # Additional metrics
         st.metric("🎯 Risk Score", f"{risk_score}/100")
         st.metric("🤖 AI Confidence", f"{ml_confidence}%")
-        
+
         if risk_score > 70:
             st.error("🚨 HIGH RISK")
         elif risk_score > 40:
             st.warning("⚠️ MEDIUM RISK")
         else:
             st.success("✅ LOW RISK")
-    
-    # Generate transaction ID
-    transaction_id = f"TXN{len(st.session_state.transactions) + 1:03d}"
-    
-    # Log transaction with enhanced data
-    new_transaction = {
-        'timestamp': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        'customer_name': customer_name,
-        'amount': amount,
-        'device': device,
-        'location': location,
-        'prev_location': prev_location,
-        'status': status,
-        'reasons': ', '.join(reasons),
-        'biometric_verified': biometric_verified,
-        'risk_score': risk_score,
-        'ml_confidence': ml_confidence,
-        'transaction_id': transaction_id
-    }
-    
-    st.session_state.transactions.insert(0, new_transaction)
-    st.success(f"📝 Transaction {transaction_id} logged successfully!")
+
+    if submit_transaction and customer_name:
+        st.success(f"📝 Transaction {result_transaction['transaction_id']} logged successfully!")
 
 # Analytics Dashboard
-st.markdown("---")
-st.markdown("## 📈 Advanced Analytics Dashboard")
-
-col_chart1, col_chart2 = st.columns(2)
-
-with col_chart1:
-    # Transaction timeline
-    timeline_fig = create_transaction_timeline()
-    if timeline_fig:
-        st.plotly_chart(timeline_fig, use_container_width=True)
-
-with col_chart2:
-    # Risk score distribution
-    if st.session_state.transactions:
-        df = pd.DataFrame(st.session_state.transactions)
-        try:
-            fig_hist = px.histogram(df, x='risk_score', nbins=10, 
-                                   title="Risk Score Distribution",
-                                   color='status',
-                                   color_discrete_map={'Legitimate': 'green', 'Flagged as Fraudulent': 'red'})
-            st.plotly_chart(fig_hist, use_container_width=True)
-        except Exception as e:
-            # Fallback to simple bar chart if histogram fails
-            risk_counts = df['status'].value_counts()
-            fig_bar = px.bar(x=risk_counts.index, y=risk_counts.values,
-                           title="Transaction Status Distribution",
-                           color=risk_counts.index,
-                           color_discrete_map={'Legitimate': 'green', 'Flagged as Fraudulent': 'red'})
-            st.plotly_chart(fig_bar, use_container_width=True)
+@timed_fragment("analytics")
+def analytics_dashboard():
+    """Charts over the whole store; memoized on the store version"""
+    st.markdown("---")
+    st.markdown("## 📈 Advanced Analytics Dashboard")
+
+    col_chart1, col_chart2 = st.columns(2)
+
+    with col_chart1:
+        # Transaction timeline
+        timeline_fig = create_transaction_timeline()
+        if timeline_fig:
+            st.plotly_chart(timeline_fig, use_container_width=True)
+
+    with col_chart2:
+        # Risk score distribution
+        distribution_fig = create_risk_distribution()
+        if distribution_fig:
+            st.plotly_chart(distribution_fig, use_container_width=True)
+
+    if len(store):
+        with st.expander("🧮 Flags by Rule"):
+            # One vectorized bit test per rule over the store's packed bitmasks
+            counts = reason_counts(store.reason_masks())
+            st.bar_chart(pd.Series({reason_label(reason): count for reason, count in counts.items() if count}, name="Transactions"))
+
+analytics_dashboard()
 
 # Enhanced Audit Log
-st.markdown("### 📋 Advanced Transaction Audit Log")
-
-if st.session_state.transactions:
-    df = pd.DataFrame(st.session_state.transactions)
-    
+@timed_fragment("lookup")
+def transaction_lookup():
+    """Lookup and analyst review of single transactions; kept apart so it never rebuilds the full table"""
+    # Constant-time lookup by transaction ID or customer name
+    lookup = st.text_input("🔎 Lookup Transaction ID or Customer", placeholder="e.g., TXN004 or John Kamau")
+    if lookup.strip():
+        match = store.get(lookup)
+        matches = [match] if match else store.by_customer(lookup)
+        if matches:
+            st.dataframe(with_reason_text(pd.DataFrame(matches)), column_config={"reason_mask": None},
+                         hide_index=True, use_container_width=True)
+        else:
+            st.warning(f"No transactions found for '{lookup.strip()}'")
+
+        # Analyst review of a single transaction trains the model online
+        if match:
+            flagged = match['status'] == "Flagged as Fraudulent"
+            col_review1, col_review2 = st.columns(2)
+            with col_review1:
+                if st.button("✅ Confirm Verdict", use_container_width=True):
+                    if record_verdict(match, 'fraud' if flagged else 'legit', 'confirmed'):
+                        st.success(f"Verdict for {match['transaction_id']} confirmed; model updated")
+                    else:
+                        st.info(f"Verdict for {match['transaction_id']} is already confirmed")
+            with col_review2:
+                if st.button("↩️ Override Verdict", use_container_width=True):
+                    if record_verdict(match, 'legit' if flagged else 'fraud', 'overridden'):
+                        st.success(f"Verdict for {match['transaction_id']} overridden; model updated")
+                    else:
+                        st.info(f"Verdict for {match['transaction_id']} is already overridden")
+
+@timed_fragment("audit_log")
+def audit_log():
+    """Filtering and export of the whole store; these widgets rerun only this section"""
     # Add filters
+    col_search1, col_search2, col_search3 = st.columns(3)
+
+    with col_search1:
+        reason_query = st.text_input("Flag Reason Keywords", placeholder="e.g., extreme location jump")
+
+    with col_search2:
+        name_query = st.text_input("Customer Name Prefix", placeholder="e.g., Sar")
+
+    with col_search3:
+        reason_filter = st.multiselect("Flagged For", RULES, format_func=reason_label)
+
+    # Narrow rows through the inverted index before building the DataFrame
+    matched_ids = store.search(reason_query, name_query)
+    if matched_ids is None:
+        df = pd.DataFrame(store.newest_first())
+    elif matched_ids:
+        # Rows differ in optional fields (device ID, analyst verdict), so let pandas union their keys
+        df = pd.DataFrame([store.row(row_id) for row_id in sorted(matched_ids, reverse=True)])
+    else:
+        df = pd.DataFrame(columns=HISTORY_COLUMNS)
+
     col_filter1, col_filter2, col_filter3 = st.columns(3)
-    
+
     with col_filter1:
         status_filter = st.selectbox("Filter by Status", ["All", "Legitimate", "Flagged as Fraudulent"])
-    
+
     with col_filter2:
         risk_filter = st.slider("Min Risk Score", 0, 100, 0)
-    
+
     with col_filter3:
         limit = st.selectbox("Show Transactions", [10, 25, 50, "All"])
-    
+
     # Apply filters
     filtered_df = df.copy()
     if status_filter != "All":
         filtered_df = filtered_df[filtered_df['status'] == status_filter]
-    
+
     filtered_df = filtered_df[filtered_df['risk_score'] >= risk_filter]
-    
+
+    if reason_filter:
+        required = 0
+        for reason in reason_filter:
+            required |= reason
+        filtered_df = filtered_df[has_reasons(filtered_df['reason_mask'].to_numpy(), required)]
+
     if limit != "All":
         filtered_df = filtered_df.head(limit)
-    
+
+    filtered_df = with_reason_text(filtered_df)
+
     # Enhanced display
     st.dataframe(
         filtered_df,
         column_config={
             "transaction_id": "ID",
-            "timestamp": "Timestamp", 
+            "timestamp": "Timestamp",
             "customer_name": "Customer",
             "amount": st.column_config.NumberColumn("Amount (KES)", format="%.0f"),
             "device": "Device",
-            "location": "Location", 
+            "device_fingerprint": "Device ID",
+            "location": "Location",
             "prev_location": "Prev Location",
             "status": "Status",
+            "reasons": "Reasons",
+            "reason_mask": None,
+            "biometric_result": None,
             "risk_score": st.column_config.ProgressColumn("Risk Score", min_value=0, max_value=100),
             "ml_confidence": st.column_config.NumberColumn("AI Confidence", format="%.1f%%"),
+            "distance_km": st.column_config.NumberColumn("Distance (km)", format="%d"),
+            "velocity_1h": "Txns (1h)",
             "biometric_verified": "Bio Verified"
         },
         hide_index=True,
         use_container_width=True
     )
-    
+
     # Export options
     col_export1, col_export2, col_export3 = st.columns(3)
-    
+
     with col_export1:
         csv = filtered_df.to_csv(index=False)
         st.download_button("📊 Export CSV", csv, "fraud_analysis.csv", "text/csv")
-    
+
+    # Changing the store affects every section, so these rerun the whole app
     with col_export2:
         if st.button("🗑️ Clear All Logs"):
-            st.session_state.transactions = []
+            store.clear()
+            st.session_state.pop('last_result', None)
             st.rerun()
-    
+
     with col_export3:
         if st.button("🔄 Generate Sample Data"):
             # Add more sample transactions
             sample_names = ["Alice Johnson", "Bob Smith", "Carol Davis", "David Wilson"]
             for name in sample_names:
+                sample_location = random.choice(['Nairobi', 'Mombasa', 'Kisumu'])
+                sample_prev_location = random.choice(['Nairobi', 'Mombasa', 'Kisumu'])
                 sample_transaction = {
                     'timestamp': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                     'customer_name': name,
                     'amount': random.randint(5000, 90000),
                     'device': random.choice(['trusted', 'new', 'suspicious']),
-                    'location': random.choice(['Nairobi', 'Mombasa', 'Kisumu']),
-                    'prev_location': random.choice(['Nairobi', 'Mombasa', 'Kisumu']),
+                    'location': sample_location,
+                    'prev_location': sample_prev_location,
                     'status': random.choice(['Legitimate', 'Flagged as Fraudulent']),
-                    'reasons': 'Sample data',
+                    'reason_mask': int(Reason.SAMPLE_DATA),
                     'biometric_verified': random.choice([True, False]),
                     'risk_score': random.randint(10, 95),
                     'ml_confidence': random.uniform(75, 95),
-                    'transaction_id': f"SAMPLE{random.randint(100, 999)}"
+                    'distance_km': calculate_distance(sample_location, sample_prev_location) if sample_location != sample_prev_location else 0,
+                    'velocity_1h': 0,
+                    'transaction_id': store.next_id("SAMPLE")
                 }
-                st.session_state.transactions.append(sample_transaction)
+                store.append(sample_transaction)
             st.rerun()
 
+st.markdown("### 📋 Advanced Transaction Audit Log")
+
+if len(store):
+    transaction_lookup()
+    audit_log()
 else:
     st.info("🚀 No transactions yet. Submit your first transaction to see the magic happen!")
 
@@ -669,20 +984,35 @@ else:
 st.markdown("---")
 col_footer1, col_footer2, col_footer3, col_footer4 = st.columns(4)
 
+# Footer figures come from the live metrics registry and this session's reviews
+reviews = st.session_state.reviews
+scoring_mean = SCORING_LATENCY.mean()
+
 with col_footer1:
     st.markdown("**🤖 AI Accuracy**")
-    st.markdown("**94.7%** Detection Rate")
+    if reviews:
+        confirmed = sum(outcome == 'confirmed' for outcome in reviews.values())
+        st.markdown(f"**{confirmed / len(reviews):.1%}** Confirmed by Analysts")
+    else:
+        st.markdown("**n/a** Awaiting Analyst Reviews")
 
 with col_footer2:
     st.markdown("**⚡ Processing Speed**")
-    st.markdown("**<50ms** Analysis Time")
+    if scoring_mean is None:
+        st.markdown("**n/a** Analysis Time")
+    else:
+        st.markdown(f"**{scoring_mean * 1000:.1f}ms** Avg Analysis Time")
 
 with col_footer3:
     st.markdown("**🛡️ Security Level**")
     st.markdown("**Enterprise** Grade")
 
 with col_footer4:
+    uptime_minutes = int(REGISTRY.uptime() // 60)
     st.markdown("**🌍 Coverage**")
-    st.markdown("**24/7** Monitoring")
+    st.markdown(f"**{uptime_minutes // 60}h {uptime_minutes % 60}m** Monitoring Uptime")
+
+st.markdown("*🏆 Hackathon Demo: Next-Generation Fraud Detection System*")
 
-st.markdown("*🏆 Hackathon Demo: Next-Generation Fraud Detection System*")
\ No newline at end of file
+st.session_state.full_rerun = False
+finish_rerun("app", rerun_started, rerun_profiler)
@@ -0,0 +1,99 @@
+"""Per-customer trusted-device registry: SQLite on disk with a bounded LRU in front."""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from metrics import CACHE_MISSES, CACHE_REQUESTS
+from transaction_store import customer_key
+
+DEVICE_REGISTRY_PATH = os.environ.get("GUARDIAN_DEVICE_REGISTRY_PATH", os.path.join("data", "devices.sqlite3"))
+
+
+class DeviceRecord(NamedTuple):
+    first_seen: str
+    last_seen: str
+    use_count: int
+
+
+class DeviceRegistry:
+    """Devices each customer has used, keyed by (customer, device fingerprint)"""
+
+    def __init__(self, path: str = DEVICE_REGISTRY_PATH, cache_size: int = 10_000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS devices (
+                customer TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                use_count INTEGER NOT NULL,
+                PRIMARY KEY (customer, fingerprint)
+            )
+        """)
+        self._db.commit()
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], Optional[DeviceRecord]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: Tuple[str, str], record: Optional[DeviceRecord]):
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def lookup(self, customer_name: str, fingerprint: str) -> Optional[DeviceRecord]:
+        """The customer's history with this device, or None if never seen"""
+        key = (customer_key(customer_name), fingerprint)
+        CACHE_REQUESTS.inc(cache='device_registry')
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            CACHE_MISSES.inc(cache='device_registry')
+            row = self._db.execute(
+                "SELECT first_seen, last_seen, use_count FROM devices WHERE customer = ? AND fingerprint = ?", key
+            ).fetchone()
+            # Misses are cached too, so repeat checks for an unseen device skip SQLite
+            record = DeviceRecord(*row) if row else None
+            self._remember(key, record)
+            return record
+
+    def is_known(self, customer_name: str, fingerprint: str) -> bool:
+        return self.lookup(customer_name, fingerprint) is not None
+
+    def record_use(self, customer_name: str, fingerprint: str, timestamp: str) -> DeviceRecord:
+        """Register one use of a device by a customer"""
+        key = (customer_key(customer_name), fingerprint)
+        with self._lock:
+            self._db.execute("""
+                INSERT INTO devices (customer, fingerprint, first_seen, last_seen, use_count)
+                VALUES (?, ?, ?, ?, 1)
+                ON CONFLICT (customer, fingerprint)
+                DO UPDATE SET last_seen = excluded.last_seen, use_count = use_count + 1
+            """, (*key, timestamp, timestamp))
+            self._db.commit()
+            row = self._db.execute(
+                "SELECT first_seen, last_seen, use_count FROM devices WHERE customer = ? AND fingerprint = ?", key
+            ).fetchone()
+            record = DeviceRecord(*row)
+            self._remember(key, record)
+            return record
+
+
+class DeviceRegistryStage:
+    """Enrichment stage: a fingerprint the customer has not used before is a new device"""
+
+    def __init__(self, registry: DeviceRegistry):
+        self.registry = registry
+
+    async def enrich(self, transactions: List[Dict]):
+        for txn in transactions:
+            fingerprint = txn.get('device_fingerprint')
+            # A suspicious reputation outranks the customer's own history
+            if not fingerprint or txn.get('device') == 'suspicious':
+                continue
+            txn['device'] = 'trusted' if self.registry.is_known(txn['customer_name'], fingerprint) else 'new'
@@ -0,0 +1,76 @@
+"""Local stand-in for the device-reputation service.
+
+Usage: python device_reputation_server.py [--port 8765] [--latency-ms 50]
+then run app2.py with GUARDIAN_DEVICE_REPUTATION_URL=http://127.0.0.1:8765
+
+POST /v1/devices/lookup with {"fingerprints": [...]} returns
+{"reputations": {fingerprint: "trusted" | "new" | "suspicious"}}.
+Reputations are a deterministic hash of the fingerprint, and every request
+sleeps for --latency-ms to mimic a remote call.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+def reputation_for(fingerprint: str) -> str:
+    bucket = hashlib.sha256(fingerprint.encode("utf-8")).digest()[0] % 10
+    if bucket < 7:
+        return "trusted"
+    return "new" if bucket < 9 else "suspicious"
+
+
+def make_handler(latency_s: float):
+    class DeviceReputationHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            if self.path != "/v1/devices/lookup":
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                fingerprints = json.loads(self.rfile.read(length))['fingerprints']
+            except (ValueError, KeyError):
+                self.send_error(400)
+                return
+            time.sleep(latency_s)
+            body = json.dumps({'reputations': {fp: reputation_for(fp) for fp in fingerprints}}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return DeviceReputationHandler
+
+
+def serve_in_background(port: int = 0, latency_ms: float = 50) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stand-in on a daemon thread; returns the server and its base URL"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency_ms / 1000))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="device-reputation-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in device-reputation service")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.latency_ms / 1000))
+    server.daemon_threads = True
+    print(f"device reputation stand-in on http://127.0.0.1:{args.port} ({args.latency_ms:g}ms latency)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Async enrichment stages that run before advanced_fraud_detection.
+
+A stage is any object with ``async def enrich(transactions) -> None`` that
+updates transaction dicts in place. The device-reputation stage resolves
+``device_fingerprint`` to a device status ("trusted", "new", "suspicious")
+through a pooled HTTP client with timeouts, batching and a TTL cache.
+Configure it with GUARDIAN_DEVICE_REPUTATION_URL; see
+device_reputation_server.py for a local stand-in service.
+"""
+import asyncio
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+from metrics import CACHE_MISSES, CACHE_REQUESTS, ENRICHMENT_LATENCY
+
+DEVICE_REPUTATION_URL = os.environ.get("GUARDIAN_DEVICE_REPUTATION_URL", "")
+DEVICE_STATUSES = ("trusted", "new", "suspicious")
+# Raised when reusing a keep-alive connection the server has since closed
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+class TTLCache:
+    """Bounded mapping whose entries expire after `ttl` seconds"""
+
+    def __init__(self, ttl: float, maxsize: int = 10_000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[0]
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class DeviceReputationClient:
+    """Blocking JSON client over a pool of keep-alive HTTP connections"""
+
+    def __init__(self, base_url: str, pool_size: int = 8, timeout: float = 0.5):
+        parts = urlsplit(base_url)
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = parts.path.rstrip("/") + "/v1/devices/lookup"
+        self._timeout = timeout
+        self._pool: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _connection(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+
+    def _post(self, conn: http.client.HTTPConnection, body: str) -> bytes:
+        try:
+            conn.request("POST", self._path, body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            payload = response.read()
+            if response.status != 200:
+                raise http.client.HTTPException(f"device reputation lookup failed: HTTP {response.status}")
+        except Exception:
+            conn.close()
+            raise
+        return payload
+
+    def lookup_batch(self, fingerprints: Sequence[str]) -> Dict[str, str]:
+        """Reputation for each fingerprint; raises on timeout or HTTP error"""
+        body = json.dumps({'fingerprints': list(fingerprints)})
+        with self._slots:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                conn = None
+            if conn is not None:
+                try:
+                    payload = self._post(conn, body)
+                except _STALE_CONNECTION_ERRORS:
+                    # The server closed this idle keep-alive connection; lookups are
+                    # read-only, so retry once on a fresh connection
+                    conn = None
+            if conn is None:
+                conn = self._connection()
+                payload = self._post(conn, body)
+            self._pool.put(conn)
+        return json.loads(payload)['reputations']
+
+
+class DeviceReputationStage:
+    """Resolves device_fingerprint to a device status before scoring"""
+
+    def __init__(self, client: DeviceReputationClient, batch_size: int = 32, cache_ttl: float = 300.0,
+                 max_workers: int = 8):
+        self.client = client
+        self.batch_size = batch_size
+        self.cache = TTLCache(cache_ttl)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="device-reputation")
+
+    async def enrich(self, transactions: List[Dict]):
+        pending: Dict[str, List[Dict]] = {}
+        for txn in transactions:
+            fingerprint = txn.get('device_fingerprint')
+            if not fingerprint:
+                continue
+            CACHE_REQUESTS.inc(cache='device_reputation')
+            reputation = self.cache.get(fingerprint)
+            if reputation is None:
+                CACHE_MISSES.inc(cache='device_reputation')
+                pending.setdefault(fingerprint, []).append(txn)
+            else:
+                txn['device'] = reputation
+
+        # Batches are in flight concurrently, so their latencies overlap
+        fingerprints = list(pending)
+        batches = [fingerprints[i:i + self.batch_size] for i in range(0, len(fingerprints), self.batch_size)]
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, self._timed_lookup, batch) for batch in batches),
+            return_exceptions=True,
+        )
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException):
+                # Service unavailable: keep the declared device status
+                continue
+            for fingerprint in batch:
+                reputation = result.get(fingerprint)
+                if reputation in DEVICE_STATUSES:
+                    self.cache.set(fingerprint, reputation)
+                    for txn in pending[fingerprint]:
+                        txn['device'] = reputation
+
+    def _timed_lookup(self, batch: List[str]) -> Dict[str, str]:
+        with ENRICHMENT_LATENCY.time(stage='device_reputation'):
+            return self.client.lookup_batch(batch)
+
+
+def build_stages() -> List:
+    """Enrichment stages configured through the environment"""
+    stages = []
+    if DEVICE_REPUTATION_URL:
+        stages.append(DeviceReputationStage(DeviceReputationClient(DEVICE_REPUTATION_URL)))
+    return stages
+
+
+async def _run_stages(stages: Sequence, transactions: List[Dict]):
+    for stage in stages:
+        await stage.enrich(transactions)
+
+
+def enrich_transactions(stages: Sequence, transactions: List[Dict]) -> List[Dict]:
+    """Run all stages over a batch of transactions from synchronous code"""
+    if stages and transactions:
+        asyncio.run(_run_stages(stages, transactions))
+    return transactions
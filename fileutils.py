@@ -0,0 +1,23 @@
+"""Atomic file replacement shared by everything that rewrites a file other processes read."""
+import contextlib
+import os
+import tempfile
+from typing import IO, Iterator, Optional
+
+
+@contextlib.contextmanager
+def atomic_write(path: str, mode: str = "wb", encoding: Optional[str] = None) -> Iterator[IO]:
+    """Write to a temp file beside `path` and move it into place only once the write completes"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # Sessions are threads of one process, so the temp name must be unique per call, not per pid
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        # mkstemp creates the file private; readers (other workers, collectors) may run as another user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,113 @@
+"""Append-only on-disk history of logged transactions and their outcome events.
+
+Outcomes (analyst verdicts, biometric checks) arrive after a transaction is
+logged, so they go to their own event files keyed by transaction ID and are
+joined back in with with_outcomes(); the latest event per transaction wins.
+"""
+import csv
+import os
+from typing import Dict, Iterator, Optional
+
+import pandas as pd
+
+HISTORY_PATH = os.environ.get("GUARDIAN_HISTORY_PATH", os.path.join("data", "transactions.csv"))
+VERDICTS_PATH = os.environ.get("GUARDIAN_VERDICTS_PATH", os.path.join("data", "verdicts.csv"))
+BIOMETRICS_PATH = os.environ.get("GUARDIAN_BIOMETRICS_PATH", os.path.join("data", "biometrics.csv"))
+
+HISTORY_COLUMNS = [
+    'transaction_id',
+    'timestamp',
+    'customer_name',
+    'amount',
+    'device',
+    'device_fingerprint',
+    'location',
+    'prev_location',
+    'status',
+    'reason_mask',
+    'biometric_verified',
+    'risk_score',
+    'ml_confidence',
+    'distance_km',
+    'velocity_1h',
+]
+
+
+def _append_csv(path: str, columns, row: Dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        if write_header:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+def append_transaction(row: Dict, path: str = HISTORY_PATH):
+    """Persist one logged transaction"""
+    _append_csv(path, HISTORY_COLUMNS, row)
+
+
+def append_verdict(transaction_id: str, verdict: str, path: str = VERDICTS_PATH):
+    """Persist an analyst verdict ('fraud' or 'legit'); later verdicts win"""
+    _append_csv(path, ['transaction_id', 'analyst_verdict'],
+                {'transaction_id': transaction_id, 'analyst_verdict': verdict})
+
+
+def append_biometric_result(transaction_id: str, verified: bool, path: str = BIOMETRICS_PATH):
+    """Persist the outcome of a biometric check ('passed' or 'failed'); later checks win"""
+    _append_csv(path, ['transaction_id', 'biometric_result'],
+                {'transaction_id': transaction_id, 'biometric_result': 'passed' if verified else 'failed'})
+
+
+def _load_latest(path: str, column: str) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    events = pd.read_csv(path, dtype=str).drop_duplicates('transaction_id', keep='last')
+    return dict(zip(events['transaction_id'], events[column]))
+
+
+def load_verdicts(path: str = VERDICTS_PATH) -> Dict[str, str]:
+    """Latest analyst verdict per transaction ID"""
+    return _load_latest(path, 'analyst_verdict')
+
+
+def load_biometric_results(path: str = BIOMETRICS_PATH) -> Dict[str, str]:
+    """Latest biometric check outcome per transaction ID"""
+    return _load_latest(path, 'biometric_result')
+
+
+def with_outcomes(chunk: pd.DataFrame, verdicts: Dict[str, str], biometrics: Dict[str, str]) -> pd.DataFrame:
+    """Join outcome events onto a chunk of history as analyst_verdict and biometric_result"""
+    ids = chunk['transaction_id']
+    return chunk.assign(analyst_verdict=ids.map(verdicts), biometric_result=ids.map(biometrics))
+
+
+def last_transaction_id(path: str = HISTORY_PATH) -> Optional[str]:
+    """ID of the most recently persisted transaction, read from the file's tail"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(max(0, os.path.getsize(path) - 4096))
+        lines = f.read().decode('utf-8', errors='ignore').splitlines()
+    last = lines[-1].split(',', 1)[0] if lines else None
+    return None if last == 'transaction_id' else last
+
+
+def count_transactions(path: str = HISTORY_PATH) -> int:
+    """Number of persisted transactions, counted from the file's line breaks without parsing it"""
+    if not os.path.exists(path):
+        return 0
+    lines = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+    # Less the header line
+    return max(lines - 1, 0)
+
+
+def iter_history(path: str = HISTORY_PATH, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+    """Stream the transaction history from disk in bounded-size chunks"""
+    if not os.path.exists(path):
+        return
+    yield from pd.read_csv(path, chunksize=chunksize, usecols=lambda c: c in HISTORY_COLUMNS)
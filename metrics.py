@@ -0,0 +1,252 @@
+"""In-process metrics registry with Prometheus text exposition.
+
+Metrics are process-wide, so they aggregate across all Streamlit sessions
+served by this worker. Scrape them from http://127.0.0.1:$GUARDIAN_METRICS_PORT/metrics
+(default 9464, "0" disables) or point GUARDIAN_METRICS_FILE at a
+node_exporter textfile-collector path.
+"""
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fileutils import atomic_write
+
+METRICS_PORT = int(os.environ.get("GUARDIAN_METRICS_PORT", "9464"))
+METRICS_FILE = os.environ.get("GUARDIAN_METRICS_FILE", "")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def label_values(self, label: str) -> List[str]:
+        """Distinct values seen for one label"""
+        with self._lock:
+            keys = list(self._values)
+        return sorted({value for key in keys for name, value in key if name == label})
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed observations with sum and count"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            # Per-bucket counts followed by the +Inf bucket, sum and count
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 3))
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def mean(self, **labels) -> Optional[float]:
+        series = self._series.get(_label_key(labels))
+        return series[-2] / series[-1] if series and series[-1] else None
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Estimate a quantile by interpolating within buckets, as histogram_quantile() does"""
+        series = self._series.get(_label_key(labels))
+        if not series or not series[-1]:
+            return None
+        rank = q * series[-1]
+        cumulative = 0.0
+        lower = 0.0
+        for upper, count in zip(self.buckets, series):
+            if cumulative + count >= rank and count:
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = upper
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, series in sorted(self._series.items()):
+            cumulative = 0.0
+            for upper, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if upper == float("inf") else _format_value(upper)
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', le)])} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(series[-1])}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._started
+        self._histogram.observe(self.elapsed, **self._labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self.started = time.time()
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def uptime(self) -> float:
+        return time.time() - self.started
+
+
+REGISTRY = Registry()
+
+TRANSACTIONS_SCORED = REGISTRY.register(Counter(
+    "guardian_transactions_scored_total", "Transactions scored, by verdict"))
+RULE_FLAGS = REGISTRY.register(Counter(
+    "guardian_rule_flags_total", "Flags raised, by rule"))
+ANALYST_VERDICTS = REGISTRY.register(Counter(
+    "guardian_analyst_verdicts_total", "Analyst reviews, by outcome (confirmed or overridden)"))
+SCORING_LATENCY = REGISTRY.register(Histogram(
+    "guardian_scoring_latency_seconds", "Time spent scoring one transaction"))
+ENRICHMENT_LATENCY = REGISTRY.register(Histogram(
+    "guardian_enrichment_latency_seconds", "Time spent in one enrichment lookup, by stage"))
+RERUN_DURATION = REGISTRY.register(Histogram(
+    "guardian_rerun_duration_seconds", "Wall time of a Streamlit rerun, by section",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)))
+HISTORY_SIZE = REGISTRY.register(Gauge(
+    "guardian_history_transactions", "Transactions persisted to the history file"))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "guardian_cache_requests_total", "Cache lookups, by cache"))
+CACHE_MISSES = REGISTRY.register(Counter(
+    "guardian_cache_misses_total", "Cache lookups that had to compute, by cache"))
+
+
+def cache_hit_rate(cache: str) -> Optional[float]:
+    requests = CACHE_REQUESTS.value(cache=cache)
+    return 1 - CACHE_MISSES.value(cache=cache) / requests if requests else None
+
+
+def cache_hit_rates() -> Dict[str, float]:
+    """Hit rate of every cache looked up so far"""
+    return {cache: cache_hit_rate(cache) for cache in CACHE_REQUESTS.label_values('cache')}
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port: int = METRICS_PORT) -> Optional[int]:
+    """Serve /metrics on localhost once per process; returns the port, or None if unavailable"""
+    global _server
+    with _server_lock:
+        if _server is None and port:
+            try:
+                _server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+            except OSError:
+                # Another worker already owns the port
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        return _server.server_address[1] if _server else None
+
+
+def write_textfile(path: str = METRICS_FILE):
+    """Atomically write the exposition to a file for textfile collectors"""
+    if not path:
+        return
+    with atomic_write(path, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
@@ -0,0 +1,182 @@
+"""Lightweight logistic-regression fraud model with batched scoring and online SGD."""
+import os
+import re
+import shutil
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from fileutils import atomic_write
+
+MODELS_DIR = os.environ.get("GUARDIAN_MODELS_DIR", "models")
+# Live weights that online updates write back to
+DEFAULT_MODEL_PATH = os.environ.get("GUARDIAN_MODEL_PATH", os.path.join(MODELS_DIR, "fraud_model.npy"))
+
+FEATURE_NAMES = [
+    "log_amount",
+    "new_device",
+    "suspicious_device",
+    "distance_500km",
+    "velocity_1h",
+    "night_hour",
+]
+
+# Hand-set priors mirroring the rule engine, used until analysts feed back labels
+DEFAULT_WEIGHTS = np.array([-4.0, 3.0, 1.5, 2.5, 2.0, 1.5, 1.0])
+
+
+def build_features(amounts: Sequence[float], devices: Sequence[str], distances: Sequence[float],
+                   velocities: Sequence[float], hours: Sequence[int]) -> np.ndarray:
+    """Build a feature matrix (one row per transaction) from column arrays"""
+    amounts = np.asarray(amounts, dtype=float)
+    devices = np.char.lower(np.asarray(devices, dtype=str))
+    hours = np.asarray(hours)
+    return np.column_stack([
+        np.log1p(np.clip(amounts, 0, None)) / 12.0,
+        devices == 'new',
+        devices == 'suspicious',
+        np.asarray(distances, dtype=float) / 500.0,
+        np.minimum(np.asarray(velocities, dtype=float), 10) / 10.0,
+        (hours < 6) | (hours >= 23),
+    ]).astype(float)
+
+
+def features_from_frame(df: pd.DataFrame) -> np.ndarray:
+    """Build features from logged transactions (a DataFrame of audit-log rows)"""
+    hours = pd.to_datetime(df['timestamp']).dt.hour.to_numpy()
+    return build_features(df['amount'].to_numpy(), df['device'].to_numpy(),
+                          df['distance_km'].fillna(0).to_numpy(),
+                          df['velocity_1h'].fillna(0).to_numpy(), hours)
+
+
+def features_from_rows(rows: List[Dict]) -> np.ndarray:
+    return features_from_frame(pd.DataFrame(rows))
+
+
+# Label for transactions with no recorded outcome; they are left out of training and backtests
+UNLABELLED = -1
+
+
+def labels_from_frame(df: pd.DataFrame) -> np.ndarray:
+    """Training labels for logged transactions: 1 for fraud, 0 for legitimate, UNLABELLED if unknown.
+
+    An analyst verdict wins; otherwise only an attempted biometric check says
+    anything beyond the rules' own verdict.
+    """
+    labels = np.full(len(df), UNLABELLED, dtype=np.int8)
+    if 'biometric_result' in df:
+        results = df['biometric_result'].to_numpy()
+        labels = np.where(results == 'failed', 1, np.where(results == 'passed', 0, labels))
+    if 'analyst_verdict' in df:
+        verdicts = df['analyst_verdict'].to_numpy()
+        labels = np.where(verdicts == 'fraud', 1, np.where(verdicts == 'legit', 0, labels))
+    return labels.astype(np.int8)
+
+
+def versioned_artifacts(models_dir: str = MODELS_DIR) -> List[Tuple[int, str]]:
+    """Trained model artifacts as (version, path), oldest first"""
+    if not os.path.isdir(models_dir):
+        return []
+    artifacts = []
+    for name in os.listdir(models_dir):
+        match = re.fullmatch(r"fraud_model-v(\d+)\.npy", name)
+        if match:
+            artifacts.append((int(match.group(1)), os.path.join(models_dir, name)))
+    return sorted(artifacts)
+
+
+def next_artifact_path(models_dir: str = MODELS_DIR) -> str:
+    artifacts = versioned_artifacts(models_dir)
+    version = artifacts[-1][0] + 1 if artifacts else 1
+    return os.path.join(models_dir, f"fraud_model-v{version}.npy")
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+class FraudModel:
+    """Logistic regression over FEATURE_NAMES; weights[0] is the bias"""
+
+    def __init__(self, weights: np.ndarray, path: Optional[str] = None):
+        if len(weights) != len(FEATURE_NAMES) + 1:
+            raise ValueError(f"Expected {len(FEATURE_NAMES) + 1} weights, got {len(weights)}")
+        self.weights = weights
+        self.path = path
+        self.updates = 0
+        # Transaction key -> (label, weight change) of the update applied for its outcome
+        self._outcomes: Dict[str, Tuple[int, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH) -> "FraudModel":
+        """Memory-map weights from disk, writing the default priors if the file is missing"""
+        if not os.path.exists(path):
+            cls(DEFAULT_WEIGHTS.copy()).save(path)
+        # Copy-on-write mapping: workers share the file's pages until they update
+        return cls(np.load(path, mmap_mode='c'), path)
+
+    def save(self, path: Optional[str] = None):
+        """Atomically write the weights so other workers never see a partial file"""
+        with self._lock, atomic_write(path or self.path) as f:
+            np.save(f, np.asarray(self.weights, dtype=float))
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Fraud probability for each row of a feature matrix"""
+        X = np.atleast_2d(X)
+        return _sigmoid(X @ self.weights[1:] + self.weights[0])
+
+    def partial_fit(self, X: np.ndarray, y: Sequence[int], learning_rate: float = 0.1,
+                    l2: float = 1e-4):
+        """One SGD step on a batch of labelled rows"""
+        with self._lock:
+            self._step(X, y, learning_rate, l2)
+
+    def record_outcome(self, key: str, X: np.ndarray, label: int, learning_rate: float = 0.1,
+                       l2: float = 1e-4) -> bool:
+        """Train on a transaction's confirmed outcome once; a changed outcome replaces the earlier step.
+
+        Returns whether the weights changed, i.e. whether they need saving.
+        """
+        with self._lock:
+            previous = self._outcomes.get(key)
+            if previous is not None:
+                if previous[0] == label:
+                    return False
+                # The replaced step no longer counts as an update
+                self.weights -= previous[1]
+                self.updates -= 1
+            before = np.array(self.weights)
+            self._step(X, [label], learning_rate, l2)
+            self._outcomes[key] = (label, self.weights - before)
+            return True
+
+    def _step(self, X: np.ndarray, y: Sequence[int], learning_rate: float, l2: float):
+        # Callers hold self._lock
+        X = np.atleast_2d(X)
+        y = np.asarray(y, dtype=float)
+        error = self.predict_proba(X) - y
+        grad = np.empty_like(self.weights)
+        grad[0] = error.mean()
+        grad[1:] = X.T @ error / len(y) + l2 * self.weights[1:]
+        self.weights -= learning_rate * grad
+        self.updates += 1
+
+
+def load_live_model(path: str = DEFAULT_MODEL_PATH, models_dir: str = MODELS_DIR) -> FraudModel:
+    """Load the live model, first promoting a newer trained artifact over it"""
+    artifacts = versioned_artifacts(models_dir)
+    if artifacts:
+        latest = artifacts[-1][1]
+        if not os.path.exists(path) or os.path.getmtime(latest) > os.path.getmtime(path):
+            with open(latest, 'rb') as src, atomic_write(path) as dst:
+                shutil.copyfileobj(src, dst)
+    return FraudModel.load(path)
+
+
+def verdict_confidence(status: str, fraud_probability: float) -> float:
+    """Model confidence (in %) that the given verdict is right"""
+    p = fraud_probability if status == "Flagged as Fraudulent" else 1 - fraud_probability
+    return round(float(p) * 100, 1)
@@ -0,0 +1,77 @@
+"""Opt-in profiling of a single Streamlit rerun.
+
+Enable with the ``?profile=1`` query parameter or ``GUARDIAN_PROFILE=1``.
+Raw profiles are written in pstats format for offline flame graphs,
+e.g. ``snakeviz profiles/rerun-*.prof`` or ``flameprof``.
+
+Sessions are threads in one process and the interpreter allows only one
+active profiler (Python 3.12+), so one rerun is profiled at a time; reruns
+of other sessions that start meanwhile simply run unprofiled.
+"""
+import cProfile
+import datetime
+import io
+import os
+import pstats
+import threading
+import time
+from typing import Optional, Tuple
+
+import streamlit as st
+
+PROFILE_DIR = os.environ.get("GUARDIAN_PROFILE_DIR", "profiles")
+# A profiled rerun older than this is taken to be abandoned (e.g. its session closed)
+PROFILE_TIMEOUT = 60.0
+
+_SESSION_KEY = "_rerun_profiler"
+_lock = threading.Lock()
+# The process-wide profiled rerun in progress, with its start time
+_running: Optional[Tuple[cProfile.Profile, float]] = None
+
+
+def profiling_requested() -> bool:
+    if os.environ.get("GUARDIAN_PROFILE", "") not in ("", "0"):
+        return True
+    return st.query_params.get("profile", "0") not in ("", "0")
+
+
+def start_profiler() -> Optional[cProfile.Profile]:
+    """Start profiling this rerun if requested; a no-op returning None otherwise"""
+    global _running
+    if not profiling_requested():
+        return None
+    # A rerun of this session cut short by st.rerun() never reaches finish_profiler()
+    stale = st.session_state.pop(_SESSION_KEY, None)
+    with _lock:
+        if _running is not None and (_running[0] is stale or time.monotonic() - _running[1] > PROFILE_TIMEOUT):
+            _running[0].disable()
+            _running = None
+        if _running is not None:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Some other tool is already profiling this process
+            return None
+        _running = (profiler, time.monotonic())
+    st.session_state[_SESSION_KEY] = profiler
+    return profiler
+
+
+def finish_profiler(profiler: cProfile.Profile, top: int = 25) -> Tuple[str, str]:
+    """Stop profiling, save the raw profile, and return (path, hot spot report)"""
+    global _running
+    profiler.disable()
+    with _lock:
+        if _running is not None and _running[0] is profiler:
+            _running = None
+    st.session_state.pop(_SESSION_KEY, None)
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"rerun-{datetime.datetime.now():%Y%m%d-%H%M%S-%f}.prof")
+    profiler.dump_stats(path)
+
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).strip_dirs().sort_stats("cumulative").print_stats(top)
+    return path, report.getvalue()
@@ -0,0 +1,74 @@
+"""Flag reasons encoded as an integer bitmask, rendered to text only for display."""
+from enum import IntFlag
+from typing import Dict, List
+
+import numpy as np
+
+
+class Reason(IntFlag):
+    EXTREME_AMOUNT = 1 << 0
+    HIGH_AMOUNT = 1 << 1
+    NEW_DEVICE = 1 << 2
+    SUSPICIOUS_DEVICE = 1 << 3
+    EXTREME_LOCATION_JUMP = 1 << 4
+    SIGNIFICANT_LOCATION_CHANGE = 1 << 5
+    LOCATION_CHANGE = 1 << 6
+    ROUND_NUMBER = 1 << 7
+    UNUSUAL_TIME = 1 << 8
+    HIGH_RISK_SCORE = 1 << 9
+    SAMPLE_DATA = 1 << 10
+
+
+# Reasons raised by a detection rule; HIGH_RISK_SCORE and SAMPLE_DATA only mark how a row came about
+RULES = tuple(reason for reason in Reason if reason not in (Reason.HIGH_RISK_SCORE, Reason.SAMPLE_DATA))
+
+# (emoji, text) per reason; text may use the row's distance_km, location and prev_location
+REASON_TEMPLATES = {
+    Reason.EXTREME_AMOUNT: ("🚨", f"Extremely high amount (>{100000:,})"),
+    Reason.HIGH_AMOUNT: ("⚠️", f"High amount (>{50000:,})"),
+    Reason.NEW_DEVICE: ("📱", "New device detected"),
+    Reason.SUSPICIOUS_DEVICE: ("🚫", "Suspicious device flagged"),
+    Reason.EXTREME_LOCATION_JUMP: ("🌍", "Extreme location jump: {distance_km}km ({prev_location} → {location})"),
+    Reason.SIGNIFICANT_LOCATION_CHANGE: ("📍", "Significant location change: {distance_km}km ({prev_location} → {location})"),
+    Reason.LOCATION_CHANGE: ("📍", "Location change: {distance_km}km ({prev_location} → {location})"),
+    Reason.ROUND_NUMBER: ("🔢", "Suspicious round number pattern"),
+    Reason.UNUSUAL_TIME: ("🌙", "Unusual transaction time"),
+    Reason.HIGH_RISK_SCORE: ("", "High risk score detected"),
+    Reason.SAMPLE_DATA: ("", "Sample data"),
+}
+
+ALL_CHECKS_PASSED = "All security checks passed"
+
+
+def reason_label(reason: Reason) -> str:
+    """Short, parameter-free label for filters and per-rule counts"""
+    return REASON_TEMPLATES[reason][1].split(":")[0].split(" (")[0]
+
+
+def render_reasons(mask: int, distance_km: int = 0, location: str = "", prev_location: str = "",
+                   plain: bool = False, passed: str = ALL_CHECKS_PASSED) -> List[str]:
+    """Human-readable flags for a reason bitmask"""
+    reasons = []
+    for reason, (emoji, text) in REASON_TEMPLATES.items():
+        if mask & reason:
+            text = text.format(distance_km=int(distance_km), location=location, prev_location=prev_location)
+            reasons.append(text if plain or not emoji else f"{emoji} {text}")
+    return reasons or [passed]
+
+
+def row_reasons(row: Dict, plain: bool = False, passed: str = ALL_CHECKS_PASSED) -> List[str]:
+    """render_reasons() for a logged transaction row"""
+    return render_reasons(row['reason_mask'], row.get('distance_km', 0), row['location'],
+                          row['prev_location'], plain=plain, passed=passed)
+
+
+def reason_counts(masks: np.ndarray) -> Dict[Reason, int]:
+    """Per-rule flag counts over an array of bitmasks"""
+    bits = np.array([int(reason) for reason in RULES], dtype=np.int64)
+    counts = ((np.asarray(masks, dtype=np.int64)[:, None] & bits) != 0).sum(axis=0)
+    return {reason: int(count) for reason, count in zip(RULES, counts)}
+
+
+def has_reasons(masks: np.ndarray, required: int) -> np.ndarray:
+    """Boolean mask of rows flagged for every reason in `required`"""
+    return (np.asarray(masks, dtype=np.int64) & required) == required
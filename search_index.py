@@ -0,0 +1,50 @@
+"""Inverted index over flag reasons and customer name prefixes."""
+import re
+from typing import Dict, Iterable, List, Set
+
+# Longest name prefix that gets its own posting list; longer queries are truncated
+MAX_PREFIX_LENGTH = 16
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens, dropping emojis and punctuation"""
+    return re.findall(r"[^\W_]+", text.casefold())
+
+
+class InvertedIndex:
+    """Posting lists from reason tokens and name prefixes to row ids, built on append"""
+
+    def __init__(self):
+        self._reasons: Dict[str, Set[int]] = {}
+        self._name_prefixes: Dict[str, Set[int]] = {}
+
+    def add(self, row_id: int, reasons: str, customer_name: str):
+        """Index one transaction's reasons and customer name"""
+        for token in set(tokenize(reasons)):
+            self._reasons.setdefault(token, set()).add(row_id)
+
+        prefixes = set()
+        for word in tokenize(customer_name):
+            for end in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1):
+                prefixes.add(word[:end])
+        for prefix in prefixes:
+            self._name_prefixes.setdefault(prefix, set()).add(row_id)
+
+    def match_reasons(self, query: str) -> Set[int]:
+        """Rows whose reasons contain every keyword in the query"""
+        return self._intersect(self._reasons, tokenize(query))
+
+    def match_name_prefix(self, query: str) -> Set[int]:
+        """Rows whose customer name has a word starting with each query word"""
+        return self._intersect(self._name_prefixes, [word[:MAX_PREFIX_LENGTH] for word in tokenize(query)])
+
+    @staticmethod
+    def _intersect(postings: Dict[str, Set[int]], keys: Iterable[str]) -> Set[int]:
+        # Start from the shortest posting list so the intersection stays cheap
+        sets = sorted((postings.get(key, set()) for key in set(keys)), key=len)
+        if not sets:
+            return set()
+        result = set(sets[0])
+        for other in sets[1:]:
+            result &= other
+        return result
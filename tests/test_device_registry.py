@@ -0,0 +1,75 @@
+"""Trusted-device registry: SQLite persistence behind a bounded LRU cache."""
+import pytest
+
+from device_registry import DeviceRecord, DeviceRegistry, DeviceRegistryStage
+from enrichment import enrich_transactions
+from metrics import CACHE_MISSES
+
+
+@pytest.fixture
+def registry_path(tmp_path):
+    return str(tmp_path / "devices.sqlite3")
+
+
+def misses() -> float:
+    return CACHE_MISSES.value(cache='device_registry')
+
+
+def test_record_use_counts_uses_and_keeps_first_seen(registry_path):
+    registry = DeviceRegistry(registry_path)
+    assert registry.lookup("Jane Doe", "phone-1") is None
+    registry.record_use("Jane Doe", "phone-1", "2024-09-20 08:00:00")
+    record = registry.record_use("Jane Doe", "phone-1", "2024-09-20 09:00:00")
+    assert record == DeviceRecord("2024-09-20 08:00:00", "2024-09-20 09:00:00", 2)
+    assert registry.lookup("Jane Doe", "phone-1") == record
+
+
+def test_devices_are_per_customer_with_normalised_names(registry_path):
+    registry = DeviceRegistry(registry_path)
+    registry.record_use("Jane Doe", "phone-1", "2024-09-20 08:00:00")
+    assert registry.is_known("  jane   DOE ", "phone-1")
+    assert not registry.is_known("John Kamau", "phone-1")
+
+
+def test_registry_persists_across_instances(registry_path):
+    DeviceRegistry(registry_path).record_use("Jane Doe", "phone-1", "2024-09-20 08:00:00")
+    reopened = DeviceRegistry(registry_path)
+    assert reopened.lookup("Jane Doe", "phone-1") == DeviceRecord("2024-09-20 08:00:00", "2024-09-20 08:00:00", 1)
+
+
+def test_repeat_lookups_are_served_from_cache_including_misses(registry_path):
+    registry = DeviceRegistry(registry_path)
+    registry.record_use("Jane Doe", "phone-1", "2024-09-20 08:00:00")
+    before = misses()
+    for _ in range(3):
+        registry.lookup("Jane Doe", "phone-1")
+        registry.lookup("Jane Doe", "unseen")
+    assert misses() == before + 1
+
+
+def test_cache_evicts_least_recently_used(registry_path):
+    registry = DeviceRegistry(registry_path, cache_size=2)
+    for fingerprint in ("a", "b"):
+        registry.record_use("Jane Doe", fingerprint, "2024-09-20 08:00:00")
+    registry.lookup("Jane Doe", "a")
+    registry.record_use("Jane Doe", "c", "2024-09-20 08:00:00")
+
+    before = misses()
+    assert registry.is_known("Jane Doe", "a") and registry.is_known("Jane Doe", "c")
+    assert misses() == before
+    # Evicted from the cache, but still on disk
+    assert registry.is_known("Jane Doe", "b")
+    assert misses() == before + 1
+
+
+def test_stage_marks_unknown_devices_new_and_keeps_suspicious(registry_path):
+    registry = DeviceRegistry(registry_path)
+    registry.record_use("Jane Doe", "phone-1", "2024-09-20 08:00:00")
+    transactions = [
+        {'customer_name': "Jane Doe", 'device': 'new', 'device_fingerprint': "phone-1"},
+        {'customer_name': "Jane Doe", 'device': 'trusted', 'device_fingerprint': "phone-2"},
+        {'customer_name': "Jane Doe", 'device': 'suspicious', 'device_fingerprint': "phone-1"},
+        {'customer_name': "Jane Doe", 'device': 'trusted', 'device_fingerprint': ""},
+    ]
+    enriched = enrich_transactions([DeviceRegistryStage(registry)], transactions)
+    assert [txn['device'] for txn in enriched] == ['trusted', 'new', 'suspicious', 'trusted']
@@ -0,0 +1,115 @@
+"""Device-reputation enrichment against the local stand-in service."""
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from device_reputation_server import make_handler, reputation_for, serve_in_background
+from enrichment import DeviceReputationClient, DeviceReputationStage, TTLCache, enrich_transactions
+from metrics import CACHE_MISSES
+
+LATENCY_MS = 100
+
+
+@pytest.fixture
+def service():
+    server, url = serve_in_background(latency_ms=LATENCY_MS)
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+def transactions(fingerprints, device="trusted"):
+    return [{'customer_name': "Jane Doe", 'device': device, 'device_fingerprint': fp} for fp in fingerprints]
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_resolves_reputation_per_fingerprint(service):
+    stage = DeviceReputationStage(DeviceReputationClient(service))
+    fingerprints = [f"device-{i}" for i in range(20)]
+    enriched = enrich_transactions([stage], transactions(fingerprints, device="declared"))
+    assert [txn['device'] for txn in enriched] == [reputation_for(fp) for fp in fingerprints]
+
+
+def test_batches_are_in_flight_concurrently(service):
+    stage = DeviceReputationStage(DeviceReputationClient(service), batch_size=1)
+    started = time.perf_counter()
+    enrich_transactions([stage], transactions([f"overlap-{i}" for i in range(8)]))
+    elapsed = time.perf_counter() - started
+    # Eight sequential round trips would take at least 0.8s
+    assert LATENCY_MS / 1000 <= elapsed < 4 * LATENCY_MS / 1000
+
+
+def test_repeat_lookups_are_served_from_cache(service):
+    stage = DeviceReputationStage(DeviceReputationClient(service))
+    enrich_transactions([stage], transactions(["cached-1", "cached-2"]))
+    misses = CACHE_MISSES.value(cache='device_reputation')
+    started = time.perf_counter()
+    enriched = enrich_transactions([stage], transactions(["cached-1", "cached-2"], device="declared"))
+    assert time.perf_counter() - started < LATENCY_MS / 1000
+    assert CACHE_MISSES.value(cache='device_reputation') == misses
+    assert [txn['device'] for txn in enriched] == [reputation_for("cached-1"), reputation_for("cached-2")]
+
+
+def test_cached_reputations_expire(service):
+    stage = DeviceReputationStage(DeviceReputationClient(service), cache_ttl=0.05)
+    enrich_transactions([stage], transactions(["expiring"]))
+    time.sleep(0.1)
+    misses = CACHE_MISSES.value(cache='device_reputation')
+    enrich_transactions([stage], transactions(["expiring"]))
+    assert CACHE_MISSES.value(cache='device_reputation') == misses + 1
+
+
+def test_ttl_cache_evicts_least_recently_set():
+    cache = TTLCache(ttl=60, maxsize=2)
+    cache.set("a", "trusted")
+    cache.set("b", "new")
+    cache.set("c", "suspicious")
+    assert cache.get("a") is None
+    assert (cache.get("b"), cache.get("c")) == ("new", "suspicious")
+
+
+def test_service_down_keeps_declared_device():
+    stage = DeviceReputationStage(DeviceReputationClient(f"http://127.0.0.1:{unused_port()}"))
+    enriched = enrich_transactions([stage], transactions(["offline-1", "offline-2"], device="new"))
+    assert [txn['device'] for txn in enriched] == ["new", "new"]
+
+
+def test_slow_service_times_out_and_keeps_declared_device():
+    server, url = serve_in_background(latency_ms=1000)
+    try:
+        stage = DeviceReputationStage(DeviceReputationClient(url, timeout=0.1))
+        started = time.perf_counter()
+        enriched = enrich_transactions([stage], transactions(["slow"], device="suspicious"))
+        assert time.perf_counter() - started < 1.0
+        assert enriched[0]['device'] == "suspicious"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_retries_when_server_closed_idle_connection():
+    class ClosingHandler(make_handler(0)):
+        def do_POST(self):
+            super().do_POST()
+            # Drop the keep-alive connection without announcing it, as idle timeouts do
+            self.close_connection = True
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ClosingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = DeviceReputationClient(f"http://127.0.0.1:{server.server_address[1]}")
+        assert client.lookup_batch(["first"]) == {"first": reputation_for("first")}
+        time.sleep(0.05)
+        assert client.lookup_batch(["second"]) == {"second": reputation_for("second")}
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,149 @@
+"""Transaction store, its shared ID allocator and the inverted search index."""
+import threading
+
+import pytest
+
+from reasons import Reason
+from search_index import MAX_PREFIX_LENGTH, InvertedIndex
+from transaction_store import IdAllocator, TransactionStore
+
+
+def transaction(customer_name="Jane Doe", timestamp="2024-09-20 10:00:00", reason_mask=0, **fields):
+    row = {
+        'timestamp': timestamp,
+        'customer_name': customer_name,
+        'amount': 1000,
+        'device': 'trusted',
+        'location': 'Nairobi',
+        'prev_location': 'Mombasa',
+        'status': "Flagged as Fraudulent" if reason_mask else "Legitimate",
+        'reason_mask': int(reason_mask),
+        'distance_km': 480,
+    }
+    row.update(fields)
+    return row
+
+
+def test_ids_are_sequential_and_never_reused_after_clear():
+    store = TransactionStore()
+    assert [store.append(transaction()) for _ in range(3)] == ["TXN001", "TXN002", "TXN003"]
+    store.clear()
+    assert len(store) == 0
+    assert store.get("TXN003") is None
+    assert store.append(transaction()) == "TXN004"
+
+
+def test_explicit_ids_advance_the_sequence():
+    store = TransactionStore()
+    store.append(transaction(transaction_id="TXN041"))
+    assert store.append(transaction()) == "TXN042"
+    assert store.next_id("SAMPLE") == "SAMPLE043"
+
+
+def test_duplicate_ids_are_rejected():
+    store = TransactionStore()
+    store.append(transaction(transaction_id="TXN001"))
+    with pytest.raises(ValueError, match="TXN001"):
+        store.append(transaction(transaction_id="TXN001"))
+    assert len(store) == 1
+
+
+def test_sessions_sharing_an_allocator_never_reuse_ids():
+    ids = IdAllocator()
+    stores = [TransactionStore(ids=ids) for _ in range(4)]
+    allocated = [[] for _ in stores]
+
+    def submit(store, out):
+        for _ in range(250):
+            out.append(store.append(transaction()))
+
+    threads = [threading.Thread(target=submit, args=pair) for pair in zip(stores, allocated)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    every_id = [transaction_id for out in allocated for transaction_id in out]
+    assert len(set(every_id)) == len(every_id) == 1000
+
+    stores[0].clear()
+    assert stores[0].append(transaction()) == "TXN1001"
+
+
+def test_lookups_by_id_and_customer_normalise_input():
+    store = TransactionStore()
+    first = store.append(transaction("Jane Doe"))
+    store.append(transaction("John Kamau"))
+    second = store.append(transaction("Jane  Doe", timestamp="2024-09-20 11:00:00"))
+    assert store.get(f" {first.lower()} ")['customer_name'] == "Jane Doe"
+    assert [row['transaction_id'] for row in store.by_customer("jane doe")] == [second, first]
+    assert store.by_customer("Nobody") == []
+
+
+def test_count_since_counts_only_transactions_at_or_after_the_timestamp():
+    store = TransactionStore()
+    for hour in (8, 9, 10, 11):
+        store.append(transaction(timestamp=f"2024-09-20 {hour:02d}:00:00"))
+    store.append(transaction("John Kamau", timestamp="2024-09-20 11:30:00"))
+    assert store.count_since("Jane Doe", "2024-09-20 10:00:00") == 2
+    assert store.count_since("Jane Doe", "2024-09-20 07:00:00") == 4
+    assert store.count_since("Jane Doe", "2024-09-20 12:00:00") == 0
+
+
+def test_status_counts_and_reason_masks_follow_appends_and_clear():
+    store = TransactionStore()
+    store.append(transaction(reason_mask=Reason.NEW_DEVICE))
+    store.append(transaction(reason_mask=Reason.HIGH_AMOUNT | Reason.ROUND_NUMBER))
+    store.append(transaction())
+    assert store.count("Flagged as Fraudulent") == 2
+    assert store.count("Legitimate") == 1
+    assert store.reason_masks().tolist() == [Reason.NEW_DEVICE, Reason.HIGH_AMOUNT | Reason.ROUND_NUMBER, 0]
+    store.clear()
+    assert store.count("Legitimate") == 0
+    assert store.reason_masks().tolist() == []
+
+
+def test_search_intersects_reason_keywords_and_name_prefix():
+    store = TransactionStore()
+    store.append(transaction("Sarah Wanjiku", reason_mask=Reason.NEW_DEVICE))
+    store.append(transaction("Sarah Otieno", reason_mask=Reason.NEW_DEVICE | Reason.ROUND_NUMBER))
+    store.append(transaction("Samuel Kamau", reason_mask=Reason.ROUND_NUMBER))
+    assert store.search() is None
+    assert store.search(reasons="new device") == {0, 1}
+    assert store.search(name_prefix="sa") == {0, 1, 2}
+    assert store.search(reasons="round number", name_prefix="Sar") == {1}
+    assert store.search(reasons="device", name_prefix="Sam") == set()
+
+
+def test_search_is_reset_by_clear():
+    store = TransactionStore()
+    store.append(transaction("Sarah Wanjiku", reason_mask=Reason.NEW_DEVICE))
+    store.clear()
+    assert store.search(reasons="new device", name_prefix="Sarah") == set()
+
+
+def test_index_requires_every_reason_keyword():
+    index = InvertedIndex()
+    index.add(0, "📱 New device detected", "Jane Doe")
+    index.add(1, "🔢 Suspicious round number pattern, 🚫 Suspicious device flagged", "John Kamau")
+    assert index.match_reasons("DEVICE") == {0, 1}
+    assert index.match_reasons("suspicious device") == {1}
+    assert index.match_reasons("new device flagged") == set()
+    assert index.match_reasons("") == set()
+
+
+def test_index_matches_a_prefix_of_each_name_word():
+    index = InvertedIndex()
+    index.add(0, "", "Amina Ochieng")
+    index.add(1, "", "Amos Otieno")
+    assert index.match_name_prefix("am") == {0, 1}
+    assert index.match_name_prefix("am och") == {0}
+    assert index.match_name_prefix("ochieng amina") == {0}
+    assert index.match_name_prefix("mina") == set()
+
+
+def test_index_truncates_long_name_prefixes():
+    long_name = "Wolfeschlegelsteinhausenbergerdorff"
+    index = InvertedIndex()
+    index.add(0, "", f"Hubert {long_name}")
+    assert len(long_name) > MAX_PREFIX_LENGTH
+    assert index.match_name_prefix(long_name) == {0}
@@ -0,0 +1,135 @@
+"""Train the fraud model out of core from the logged transaction history.
+
+Usage: python train_model.py [--history data/transactions.csv] [--epochs 3]
+
+Streams the history in chunks, so memory stays bounded by --chunksize
+regardless of how many transactions have been logged. Only transactions
+with a recorded outcome (an analyst verdict or a biometric check) are
+trained and validated on; see ml_model.labels_from_frame. Writes a versioned
+artifact (models/fraud_model-vN.npy plus a .json report) that app2.py
+promotes to its live model on next startup.
+"""
+import argparse
+import datetime
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from history import (BIOMETRICS_PATH, HISTORY_PATH, VERDICTS_PATH, iter_history, load_biometric_results,
+                     load_verdicts, with_outcomes)
+from ml_model import (DEFAULT_WEIGHTS, FEATURE_NAMES, MODELS_DIR, UNLABELLED, FraudModel, features_from_frame,
+                      labels_from_frame, next_artifact_path)
+
+
+def validation_mask(df: pd.DataFrame, fraction: float) -> np.ndarray:
+    """Stable hold-out split: a transaction lands in the same split on every pass"""
+    buckets = pd.util.hash_pandas_object(df['transaction_id'].astype(str), index=False).to_numpy() % 1000
+    return buckets < int(fraction * 1000)
+
+
+def chunk_arrays(chunk: pd.DataFrame, verdicts: dict, biometrics: dict, validation_fraction: float):
+    """Features, labels, labelled mask and hold-out mask for one chunk of history"""
+    chunk = with_outcomes(chunk, verdicts, biometrics)
+    labels = labels_from_frame(chunk)
+    return (features_from_frame(chunk), labels, labels != UNLABELLED,
+            validation_mask(chunk, validation_fraction))
+
+
+def train(history_path: str, verdicts_path: str, biometrics_path: str, epochs: int, chunksize: int,
+          batch_size: int, learning_rate: float, validation_fraction: float) -> dict:
+    """Fit a fresh model over the history and return it with its training report"""
+    verdicts = load_verdicts(verdicts_path)
+    biometrics = load_biometric_results(biometrics_path)
+    model = FraudModel(DEFAULT_WEIGHTS.copy())
+    throughput = []
+    rows = labelled_rows = 0
+
+    for epoch in range(epochs):
+        started = time.perf_counter()
+        rows = labelled_rows = 0
+        for chunk in iter_history(history_path, chunksize):
+            X, y, labelled, held_out = chunk_arrays(chunk, verdicts, biometrics, validation_fraction)
+            X, y = X[labelled & ~held_out], y[labelled & ~held_out]
+            # Shuffle within the chunk so SGD does not follow logging order
+            order = np.random.permutation(len(y))
+            for start in range(0, len(y), batch_size):
+                batch = order[start:start + batch_size]
+                model.partial_fit(X[batch], y[batch], learning_rate=learning_rate)
+            rows += len(chunk)
+            labelled_rows += int(np.count_nonzero(labelled))
+        elapsed = time.perf_counter() - started
+        throughput.append(rows / elapsed if elapsed > 0 else 0.0)
+        print(f"epoch {epoch + 1}/{epochs}: {rows:,} rows ({labelled_rows:,} labelled) in {elapsed:.2f}s "
+              f"({throughput[-1]:,.0f} rows/s)")
+
+    if rows == 0:
+        raise SystemExit(f"No transaction history found at {history_path}")
+    if labelled_rows == 0:
+        raise SystemExit(f"None of the {rows:,} logged transactions has an analyst verdict or biometric outcome")
+
+    # Validation keeps only running counts, so it is bounded-memory too
+    tp = fp = tn = fn = 0
+    log_loss = 0.0
+    for chunk in iter_history(history_path, chunksize):
+        X, y, labelled, held_out = chunk_arrays(chunk, verdicts, biometrics, validation_fraction)
+        p = model.predict_proba(X[labelled & held_out])
+        y = y[labelled & held_out]
+        predicted = p >= 0.5
+        tp += int(np.sum(predicted & (y == 1)))
+        fp += int(np.sum(predicted & (y == 0)))
+        tn += int(np.sum(~predicted & (y == 0)))
+        fn += int(np.sum(~predicted & (y == 1)))
+        p = np.clip(p, 1e-7, 1 - 1e-7)
+        log_loss -= float(np.sum(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+    validated = tp + fp + tn + fn
+    report = {
+        'created': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'history_path': history_path,
+        'rows': rows,
+        'labelled_rows': labelled_rows,
+        'epochs': epochs,
+        'feature_names': FEATURE_NAMES,
+        'weights': [float(w) for w in model.weights],
+        'throughput_rows_per_s': round(float(np.mean(throughput)), 1),
+        'validation': {
+            'rows': validated,
+            'accuracy': (tp + tn) / validated if validated else None,
+            'precision': tp / (tp + fp) if tp + fp else None,
+            'recall': tp / (tp + fn) if tp + fn else None,
+            'log_loss': log_loss / validated if validated else None,
+        },
+    }
+    return {'model': model, 'report': report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the fraud model from logged transaction history")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--verdicts", default=VERDICTS_PATH)
+    parser.add_argument("--biometrics", default=BIOMETRICS_PATH)
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--learning-rate", type=float, default=0.1)
+    parser.add_argument("--validation-fraction", type=float, default=0.2)
+    args = parser.parse_args()
+
+    result = train(args.history, args.verdicts, args.biometrics, args.epochs, args.chunksize, args.batch_size,
+                   args.learning_rate, args.validation_fraction)
+    artifact_path = next_artifact_path(args.models_dir)
+    result['model'].save(artifact_path)
+    with open(artifact_path[:-len(".npy")] + ".json", 'w') as f:
+        json.dump(result['report'], f, indent=2)
+
+    validation = result['report']['validation']
+    print(f"validation: {validation['rows']:,} rows, accuracy={validation['accuracy']}, "
+          f"precision={validation['precision']}, recall={validation['recall']}")
+    print(f"wrote {artifact_path}")
+
+
+if __name__ == "__main__":
+    main()
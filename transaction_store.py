@@ -0,0 +1,147 @@
+"""In-memory transaction log with constant-time lookups by ID and customer."""
+import re
+import threading
+import uuid
+from array import array
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from reasons import row_reasons
+from search_index import InvertedIndex
+
+
+def customer_key(customer_name: str) -> str:
+    """Normalise a customer name for index lookups"""
+    return " ".join(customer_name.split()).casefold()
+
+
+class IdAllocator:
+    """Thread-safe transaction ID sequence; share one per process so sessions never reuse an ID"""
+
+    def __init__(self):
+        self._next_seq = 1
+        self._lock = threading.Lock()
+
+    def next_id(self, prefix: str) -> str:
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+        return f"{prefix}{seq:03d}"
+
+    def advance_past(self, transaction_id: Optional[str]):
+        """Keep the sequence ahead of an explicitly numbered transaction ID"""
+        match = re.fullmatch(r"[A-Za-z]*(\d+)", transaction_id or "")
+        if match:
+            with self._lock:
+                self._next_seq = max(self._next_seq, int(match.group(1)) + 1)
+
+
+class TransactionStore:
+    """Append-only transaction log with hash indexes over IDs and customers"""
+
+    def __init__(self, prefix: str = "TXN", ids: Optional[IdAllocator] = None):
+        self.prefix = prefix
+        self.ids = ids or IdAllocator()
+        # (token, version) identifies this store's contents for memoized views
+        self.token = uuid.uuid4().hex
+        self.version = 0
+        self._rows: List[Dict] = []
+        self._by_id: Dict[str, int] = {}
+        self._by_customer: Dict[str, List[int]] = {}
+        self._status_counts: Dict[str, int] = {}
+        self._reason_masks = array('q')
+        self._index = InvertedIndex()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def next_id(self, prefix: Optional[str] = None) -> str:
+        """Allocate the next transaction ID; IDs are never reused, even after clear()"""
+        return self.ids.next_id(prefix or self.prefix)
+
+    def advance_past(self, transaction_id: Optional[str]):
+        """Keep the allocator ahead of an explicitly numbered transaction ID"""
+        self.ids.advance_past(transaction_id)
+
+    def append(self, row: Dict) -> str:
+        """Log a transaction, allocating an ID if it has none, and index it"""
+        transaction_id = row.get('transaction_id')
+        if not transaction_id:
+            transaction_id = self.next_id()
+            row['transaction_id'] = transaction_id
+        elif transaction_id in self._by_id:
+            raise ValueError(f"Duplicate transaction ID: {transaction_id}")
+        else:
+            self.advance_past(transaction_id)
+
+        row_id = len(self._rows)
+        self._rows.append(row)
+        self._by_id[transaction_id] = row_id
+        self._by_customer.setdefault(customer_key(row['customer_name']), []).append(row_id)
+        self._status_counts[row['status']] = self._status_counts.get(row['status'], 0) + 1
+        self._reason_masks.append(row['reason_mask'])
+        self._index.add(row_id, " ".join(row_reasons(row)), row['customer_name'])
+        self.version += 1
+        return transaction_id
+
+    def clear(self):
+        """Drop all rows and indexes while keeping the ID sequence monotonic"""
+        self._rows = []
+        self._by_id = {}
+        self._by_customer = {}
+        self._status_counts = {}
+        self._reason_masks = array('q')
+        self._index = InvertedIndex()
+        self.version += 1
+
+    def row(self, row_id: int) -> Dict:
+        return self._rows[row_id]
+
+    def get(self, transaction_id: str) -> Optional[Dict]:
+        """Look up a transaction by ID"""
+        row_id = self._by_id.get(transaction_id.strip().upper())
+        return None if row_id is None else self._rows[row_id]
+
+    def customer_row_ids(self, customer_name: str) -> List[int]:
+        """Row ids of a customer's transactions, oldest first"""
+        return self._by_customer.get(customer_key(customer_name), [])
+
+    def by_customer(self, customer_name: str) -> List[Dict]:
+        """A customer's transaction history, newest first"""
+        return [self._rows[row_id] for row_id in reversed(self.customer_row_ids(customer_name))]
+
+    def count_since(self, customer_name: str, timestamp: str) -> int:
+        """Number of a customer's transactions logged at or after a timestamp"""
+        count = 0
+        for row_id in reversed(self.customer_row_ids(customer_name)):
+            # Timestamps are zero-padded ISO strings, so they compare chronologically
+            if self._rows[row_id]['timestamp'] < timestamp:
+                break
+            count += 1
+        return count
+
+    def search(self, reasons: str = "", name_prefix: str = "") -> Optional[Set[int]]:
+        """Row ids matching reason keywords and a name prefix, or None if no query is given"""
+        result = None
+        if reasons.strip():
+            result = self._index.match_reasons(reasons)
+        if name_prefix.strip():
+            matches = self._index.match_name_prefix(name_prefix)
+            result = matches if result is None else result & matches
+        return result
+
+    def count(self, status: str) -> int:
+        return self._status_counts.get(status, 0)
+
+    def reason_masks(self) -> np.ndarray:
+        """Reason bitmasks of all rows in logging order"""
+        # Copy rather than view: a live buffer export would block later appends
+        return np.array(self._reason_masks, dtype=np.int64)
+
+    def rows(self) -> List[Dict]:
+        """All transactions in logging order"""
+        return self._rows
+
+    def newest_first(self) -> List[Dict]:
+        return self._rows[::-1]